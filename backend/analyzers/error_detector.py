@@ -1,10 +1,81 @@
-from typing import Dict, List, Any, Optional
-from datetime import datetime, timedelta
+from typing import Dict, List, Any, Optional, Tuple
+from datetime import datetime
+from functools import lru_cache
+import calendar
+from types import MappingProxyType
 import re
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Creditor-name keywords that mark a collection as medical debt
+_MEDICAL_CREDITOR = re.compile(r"medical|hospital|clinic|health", re.IGNORECASE)
+
+# Account statuses that indicate the account is closed or paid off
+_CLOSED_OR_PAID = re.compile(r"closed|paid", re.IGNORECASE)
+
+# Account types that are expected to report a credit limit
+_REVOLVING_TYPES = frozenset({"credit card", "revolving"})
+
+# Recommended dispute strategy per error type (default: factual_dispute)
+_ERROR_STRATEGIES = MappingProxyType({
+    "outdated_negative": "fcra_violation",
+    "outdated_inquiry": "fcra_violation",
+    "balance_exceeds_limit": "factual_dispute",
+    "duplicate_account": "not_my_account",
+    "impossible_late_pattern": "fcra_violation",
+    "paid_collection": "collection_validation",
+    "medical_collection_ncap": "collection_validation",
+    "closed_with_balance": "factual_dispute",
+    "unauthorized_inquiry": "fcra_violation",
+    "identity_theft": "section_605b"
+})
+
+# Severity -> priority number (1 = highest)
+_SEVERITY_PRIORITY = MappingProxyType({"critical": 1, "high": 2, "medium": 3, "low": 4})
+
+# Max disputes recommended per analysis
+MAX_RECOMMENDED_DISPUTES = 15
+
+def _priority_key(error: Dict) -> Tuple[int, int]:
+    """Sort key: highest priority first, then largest estimated impact"""
+    return (error.get("priority", 5), -error.get("estimated_impact", 0))
+
+# Date shapes accepted by the cached parsers below
+_MONTH_YEAR = re.compile(r"([0-9]{1,2})/([0-9]{4})")
+_MONTH_DAY_YEAR = re.compile(r"([0-9]{1,2})/([0-9]{1,2})/([0-9]{4})")
+
+def _month_index(year: int, month: int) -> int:
+    """Months since year 0, so MM/YYYY dates compare as plain ints"""
+    return year * 12 + month - 1
+
+def _day_index(year: int, month: int, day: int) -> int:
+    """Monotonic day key (31-day months), so MM/DD/YYYY dates compare as plain ints"""
+    return _month_index(year, month) * 31 + day - 1
+
+@lru_cache(maxsize=4096)
+def _parse_month_year(value: str) -> Optional[int]:
+    """Parse an MM/YYYY date into a month index, or None if malformed"""
+    match = _MONTH_YEAR.fullmatch(value)
+    if not match:
+        return None
+    month, year = int(match.group(1)), int(match.group(2))
+    if not 1 <= month <= 12:
+        return None
+    return _month_index(year, month)
+
+@lru_cache(maxsize=4096)
+def _parse_month_day_year(value: str) -> Optional[int]:
+    """Parse an MM/DD/YYYY date into a day index, or None if malformed"""
+    match = _MONTH_DAY_YEAR.fullmatch(value)
+    if not match:
+        return None
+    month, day, year = int(match.group(1)), int(match.group(2)), int(match.group(3))
+    # Real calendar days only (02/30 is malformed, 02/29 only in leap years)
+    if not 1 <= month <= 12 or not 1 <= day <= calendar.monthrange(year, month)[1]:
+        return None
+    return _day_index(year, month, day)
+
 class ErrorDetector:
     """Detect 20+ error types in credit reports"""
     
@@ -172,28 +243,51 @@ class ErrorDetector:
         }
     }
     
-    def analyze_report(self, report_data: Dict) -> Dict[str, Any]:
-        """Analyze a credit report for all error types"""
+    # Static per-type error fields, resolved once at import:
+    # (name, severity, fcra_section, estimated_impact, priority, dispute_strategy)
+    _ERROR_TEMPLATES = MappingProxyType({
+        error_type: (
+            info["name"],
+            info["severity"],
+            info["fcra_section"],
+            info["estimated_impact"],
+            _SEVERITY_PRIORITY.get(info["severity"], 3),
+            _ERROR_STRATEGIES.get(error_type, "factual_dispute")
+        )
+        for error_type, info in ERROR_TYPES.items()
+    })
+    
+    def analyze_report(self, report_data: Dict, now: datetime = None) -> Dict[str, Any]:
+        """Analyze a credit report for all error types (dated relative to now)"""
         errors = []
         discrepancies = []
         
         accounts = report_data.get("accounts", [])
         parsed_data = report_data.get("parsed_data", {})
         
-        # Check each account for errors
+        # Nothing to analyze (empty upload, parser failure, new client)
+        if not accounts and not parsed_data.get("inquiries") and not parsed_data.get("public_records"):
+            return self._empty_analysis()
+        
+        now = now or datetime.utcnow()
+        seven_years_ago = _month_index(now.year - 7, now.month)
+        
+        # Check each account for errors and outdated items in one pass
+        outdated_errors = []
         for account in accounts:
-            account_errors = self._analyze_account(account)
-            errors.extend(account_errors)
+            errors.extend(self._analyze_account(account))
+            outdated = self._check_outdated_account(account, seven_years_ago)
+            if outdated:
+                outdated_errors.append(outdated)
         
         # Check for cross-bureau discrepancies
         discrepancies = self._check_cross_bureau_discrepancies(accounts)
         
-        # Check for outdated items
-        outdated_errors = self._check_outdated_items(accounts, parsed_data)
+        # Outdated items are reported after the per-account errors
         errors.extend(outdated_errors)
         
         # Check inquiries
-        inquiry_errors = self._check_inquiries(parsed_data.get("inquiries", []))
+        inquiry_errors = self._check_inquiries(parsed_data.get("inquiries", []), now)
         errors.extend(inquiry_errors)
         
         # Check public records
@@ -202,6 +296,7 @@ class ErrorDetector:
         
         # Calculate totals and impact
         total_impact = sum(e.get("estimated_impact", 0) for e in errors)
+        ranked = self._rank_by_priority(errors)
         
         return {
             "total_errors": len(errors),
@@ -210,18 +305,38 @@ class ErrorDetector:
             "errors": errors,
             "discrepancies": discrepancies,
             "error_summary": self._summarize_errors(errors),
-            "priority_ranking": self._rank_by_priority(errors),
-            "recommended_disputes": self._generate_dispute_recommendations(errors)
+            "priority_ranking": ranked,
+            "recommended_disputes": self._generate_dispute_recommendations(ranked)
+        }
+    
+    def _empty_analysis(self) -> Dict[str, Any]:
+        """Analysis result for a report with nothing to check"""
+        return {
+            "total_errors": 0,
+            "total_discrepancies": 0,
+            "total_estimated_impact": 0,
+            "errors": [],
+            "discrepancies": [],
+            "error_summary": {"critical": 0, "high": 0, "medium": 0, "low": 0},
+            "priority_ranking": [],
+            "recommended_disputes": []
         }
     
     def _analyze_account(self, account: Dict) -> List[Dict]:
         """Analyze a single account for errors"""
         errors = []
         
-        # Check balance vs limit
-        balance = account.get("current_balance", 0) or 0
-        limit = account.get("credit_limit", 0) or 0
+        # Read every field the rules need once, coalescing missing values
+        get = account.get
+        balance = get("current_balance") or 0
+        limit = get("credit_limit") or 0
+        status = get("account_status") or ""
+        late_30 = get("late_30_count") or 0
+        late_60 = get("late_60_count") or 0
+        late_90 = get("late_90_count") or 0
+        is_collection = get("is_collection")
         
+        # Check balance vs limit
         if limit > 0 and balance > limit:
             errors.append(self._create_error(
                 "balance_exceeds_limit",
@@ -230,8 +345,8 @@ class ErrorDetector:
             ))
         
         # Check missing credit limit on open accounts
-        if account.get("account_status", "").lower() == "open" and limit == 0:
-            if account.get("account_type", "").lower() in ["credit card", "revolving"]:
+        if limit == 0 and status.lower() == "open":
+            if (get("account_type") or "").lower() in _REVOLVING_TYPES:
                 errors.append(self._create_error(
                     "missing_credit_limit",
                     account,
@@ -239,10 +354,6 @@ class ErrorDetector:
                 ))
         
         # Check impossible late pattern
-        late_30 = account.get("late_30_count", 0) or 0
-        late_60 = account.get("late_60_count", 0) or 0
-        late_90 = account.get("late_90_count", 0) or 0
-        
         if late_90 > 0 and (late_30 == 0 or late_60 == 0):
             errors.append(self._create_error(
                 "impossible_late_pattern",
@@ -251,32 +362,26 @@ class ErrorDetector:
             ))
         
         # Check closed with balance
-        status = account.get("account_status", "").lower()
-        if "closed" in status or "paid" in status:
-            if balance > 0 and not account.get("is_collection"):
-                errors.append(self._create_error(
-                    "closed_with_balance",
-                    account,
-                    f"Closed/paid account shows ${balance} balance"
-                ))
+        if balance > 0 and not is_collection and _CLOSED_OR_PAID.search(status):
+            errors.append(self._create_error(
+                "closed_with_balance",
+                account,
+                f"Closed/paid account shows ${balance} balance"
+            ))
         
         # Check charge-off balance growth
-        if account.get("is_charge_off"):
-            # Would need historical data to verify
-            pass
+        # (would need historical data to verify is_charge_off accounts)
         
         # Check for medical collections
-        if account.get("is_collection"):
-            creditor = account.get("creditor_name", "").lower()
-            if any(term in creditor for term in ["medical", "hospital", "clinic", "health"]):
-                errors.append(self._create_error(
-                    "medical_collection_ncap",
-                    account,
-                    "Medical collection - may be eligible for NCAP removal"
-                ))
+        if is_collection and _MEDICAL_CREDITOR.search(get("creditor_name") or ""):
+            errors.append(self._create_error(
+                "medical_collection_ncap",
+                account,
+                "Medical collection - may be eligible for NCAP removal"
+            ))
         
         # Check authorized user with negatives
-        if account.get("is_authorized_user") and account.get("is_negative"):
+        if get("is_authorized_user") and get("is_negative"):
             errors.append(self._create_error(
                 "authorized_user_negative",
                 account,
@@ -289,91 +394,84 @@ class ErrorDetector:
         """Check for discrepancies between bureaus"""
         discrepancies = []
         
-        # Group by account number
+        # Single pass: per account number track the reported balances and
+        # statuses plus whether any of them differ from the first report
         by_account = {}
         for account in accounts:
             acct_num = account.get("account_number", "")
-            if acct_num:
-                if acct_num not in by_account:
-                    by_account[acct_num] = []
-                by_account[acct_num].append(account)
+            if not acct_num:
+                continue
+            balance = account.get("current_balance", 0)
+            status = account.get("account_status", "")
+            
+            state = by_account.get(acct_num)
+            if state is None:
+                by_account[acct_num] = [[balance], [status], False, False]
+                continue
+            
+            balances, statuses = state[0], state[1]
+            if balance != balances[0]:
+                state[2] = True
+            if status != statuses[0]:
+                state[3] = True
+            balances.append(balance)
+            statuses.append(status)
         
-        # Check for discrepancies
-        for acct_num, acct_list in by_account.items():
-            if len(acct_list) > 1:
-                # Check balance discrepancies
-                balances = [a.get("current_balance", 0) for a in acct_list]
-                if len(set(balances)) > 1:
-                    discrepancies.append({
-                        "type": "cross_bureau_discrepancy",
-                        "account_number": acct_num,
-                        "description": f"Balance varies across bureaus: {balances}",
-                        "severity": "high",
-                        "fcra_section": "623(a)(1)"
-                    })
-                
-                # Check status discrepancies
-                statuses = [a.get("account_status", "") for a in acct_list]
-                if len(set(statuses)) > 1:
-                    discrepancies.append({
-                        "type": "cross_bureau_discrepancy",
-                        "account_number": acct_num,
-                        "description": f"Status varies across bureaus: {statuses}",
-                        "severity": "high",
-                        "fcra_section": "623(a)(1)"
-                    })
+        for acct_num, (balances, statuses, balance_differs, status_differs) in by_account.items():
+            if balance_differs:
+                discrepancies.append({
+                    "type": "cross_bureau_discrepancy",
+                    "account_number": acct_num,
+                    "description": f"Balance varies across bureaus: {balances}",
+                    "severity": "high",
+                    "fcra_section": "623(a)(1)"
+                })
+            
+            if status_differs:
+                discrepancies.append({
+                    "type": "cross_bureau_discrepancy",
+                    "account_number": acct_num,
+                    "description": f"Status varies across bureaus: {statuses}",
+                    "severity": "high",
+                    "fcra_section": "623(a)(1)"
+                })
         
         return discrepancies
     
-    def _check_outdated_items(self, accounts: List[Dict], parsed_data: Dict) -> List[Dict]:
-        """Check for items past reporting periods"""
-        errors = []
-        now = datetime.utcnow()
-        
-        seven_years_ago = now - timedelta(days=7*365)
-        ten_years_ago = now - timedelta(days=10*365)
+    def _check_outdated_account(self, account: Dict, seven_years_ago: int) -> Optional[Dict]:
+        """Check a single account for a negative item past the 7-year period"""
+        date_opened = account.get("date_opened", "")
         
-        for account in accounts:
-            date_opened = account.get("date_opened", "")
-            
-            # Check for negative items over 7 years
-            if account.get("is_negative") and date_opened:
-                try:
-                    opened_date = datetime.strptime(date_opened, "%m/%Y")
-                    if opened_date < seven_years_ago:
-                        errors.append(self._create_error(
-                            "outdated_negative",
-                            account,
-                            f"Negative item older than 7 years (opened {date_opened})"
-                        ))
-                except:
-                    pass
+        if account.get("is_negative") and date_opened:
+            opened = _parse_month_year(date_opened)
+            if opened is not None and opened <= seven_years_ago:
+                return self._create_error(
+                    "outdated_negative",
+                    account,
+                    f"Negative item older than 7 years (opened {date_opened})"
+                )
         
-        return errors
+        return None
     
-    def _check_inquiries(self, inquiries: List[Dict]) -> List[Dict]:
+    def _check_inquiries(self, inquiries: List[Dict], now: datetime = None) -> List[Dict]:
         """Check for inquiry-related errors"""
         errors = []
-        now = datetime.utcnow()
-        two_years_ago = now - timedelta(days=2*365)
+        now = now or datetime.utcnow()
+        two_years_ago = _day_index(now.year - 2, now.month, now.day)
         
         for inquiry in inquiries:
             if inquiry.get("type") == "hard":
                 inquiry_date = inquiry.get("inquiry_date", "")
-                try:
-                    if inquiry_date:
-                        date = datetime.strptime(inquiry_date, "%m/%d/%Y")
-                        if date < two_years_ago:
-                            errors.append({
-                                "type": "outdated_inquiry",
-                                "description": f"Hard inquiry from {inquiry_date} exceeds 2-year limit",
-                                "severity": "medium",
-                                "fcra_section": "605(a)(3)",
-                                "estimated_impact": 5,
-                                "inquiry": inquiry
-                            })
-                except:
-                    pass
+                parsed = _parse_month_day_year(inquiry_date) if inquiry_date else None
+                if parsed is not None and parsed <= two_years_ago:
+                    errors.append({
+                        "type": "outdated_inquiry",
+                        "description": f"Hard inquiry from {inquiry_date} exceeds 2-year limit",
+                        "severity": "medium",
+                        "fcra_section": "605(a)(3)",
+                        "estimated_impact": 5,
+                        "inquiry": inquiry
+                    })
         
         return errors
     
@@ -399,44 +497,27 @@ class ErrorDetector:
     
     def _create_error(self, error_type: str, account: Dict, description: str) -> Dict:
         """Create standardized error object"""
-        error_info = self.ERROR_TYPES.get(error_type, {})
+        template = self._ERROR_TEMPLATES.get(error_type)
+        if template is None:
+            template = (error_type, "medium", "623(a)(1)", 10, 3,
+                        _ERROR_STRATEGIES.get(error_type, "factual_dispute"))
+        name, severity, fcra_section, estimated_impact, priority, strategy = template
         
         return {
             "type": error_type,
-            "name": error_info.get("name", error_type),
+            "name": name,
             "description": description,
             "account": {
                 "creditor_name": account.get("creditor_name"),
                 "account_number": account.get("account_number"),
                 "account_type": account.get("account_type")
             },
-            "severity": error_info.get("severity", "medium"),
-            "fcra_section": error_info.get("fcra_section", "623(a)(1)"),
-            "estimated_impact": error_info.get("estimated_impact", 10),
-            "dispute_strategy": self._get_strategy_for_error(error_type),
-            "priority": self._severity_to_priority(error_info.get("severity", "medium"))
-        }
-    
-    def _get_strategy_for_error(self, error_type: str) -> str:
-        """Get recommended dispute strategy for error type"""
-        strategies = {
-            "outdated_negative": "fcra_violation",
-            "outdated_inquiry": "fcra_violation",
-            "balance_exceeds_limit": "factual_dispute",
-            "duplicate_account": "not_my_account",
-            "impossible_late_pattern": "fcra_violation",
-            "paid_collection": "collection_validation",
-            "medical_collection_ncap": "collection_validation",
-            "closed_with_balance": "factual_dispute",
-            "unauthorized_inquiry": "fcra_violation",
-            "identity_theft": "section_605b"
+            "severity": severity,
+            "fcra_section": fcra_section,
+            "estimated_impact": estimated_impact,
+            "dispute_strategy": strategy,
+            "priority": priority
         }
-        return strategies.get(error_type, "factual_dispute")
-    
-    def _severity_to_priority(self, severity: str) -> int:
-        """Convert severity to priority number"""
-        mapping = {"critical": 1, "high": 2, "medium": 3, "low": 4}
-        return mapping.get(severity, 3)
     
     def _summarize_errors(self, errors: List[Dict]) -> Dict:
         """Create summary statistics"""
@@ -448,14 +529,13 @@ class ErrorDetector:
     
     def _rank_by_priority(self, errors: List[Dict]) -> List[Dict]:
         """Rank errors by priority"""
-        return sorted(errors, key=lambda x: (x.get("priority", 5), -x.get("estimated_impact", 0)))
+        return sorted(errors, key=_priority_key)
     
-    def _generate_dispute_recommendations(self, errors: List[Dict]) -> List[Dict]:
-        """Generate dispute recommendations"""
-        ranked = self._rank_by_priority(errors)
+    def _generate_dispute_recommendations(self, ranked_errors: List[Dict]) -> List[Dict]:
+        """Generate dispute recommendations from errors already ranked by priority"""
         recommendations = []
         
-        for i, error in enumerate(ranked[:15]):  # Max 15 disputes
+        for i, error in enumerate(ranked_errors[:MAX_RECOMMENDED_DISPUTES]):
             rec = {
                 "rank": i + 1,
                 "error_type": error.get("type"),
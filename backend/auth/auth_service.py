@@ -1,57 +1,171 @@
 from passlib.context import CryptContext
-from jose import JWTError, jwt
+import jwt
 from datetime import datetime, timedelta
+from sqlalchemy import exists
 from sqlalchemy.orm import Session
 from models import User, Client, AuditLog
 from config import settings
+from collections import namedtuple
+import hashlib
+import hmac
 import logging
+import secrets
+import threading
+import time
 
 logger = logging.getLogger(__name__)
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# New hashes use argon2id; existing bcrypt hashes still verify and are
+# upgraded on the next successful login.
+pwd_context = CryptContext(
+    schemes=["argon2", "bcrypt"],
+    deprecated="auto",
+    argon2__memory_cost=19456,
+    argon2__time_cost=2,
+    argon2__parallelism=1
+)
+
+# JWT key material and algorithm list, resolved once at import
+_JWT_KEY = settings.SECRET_KEY
+_JWT_ALGORITHMS = [settings.ALGORITHM]
+
+# Short-lived cache of successful password verifications, keyed on the
+# stored hash so a password change invalidates it. Only successes are
+# cached, and only the correct password can hit: a wrong one always pays
+# the full hashing cost. Entries hold an HMAC of the password under a
+# per-process random key, so a memory dump cannot be brute-forced offline
+# like a bare sha256, and it is compared in constant time.
+VERIFY_CACHE_TTL_SECONDS = 60
+VERIFY_CACHE_MAX_SIZE = 1024
+_VERIFY_CACHE_KEY = secrets.token_bytes(32)
+_verify_cache = {}
+_verify_cache_lock = threading.Lock()
+
+def _password_digest(plain_password: str) -> bytes:
+    return hmac.new(_VERIFY_CACHE_KEY, plain_password.encode("utf-8"), hashlib.sha256).digest()
+
+# Lightweight view of the authenticated user, cached per access token so
+# authenticated requests skip the user SELECT for a short while.
+# Deactivation takes effect within USER_CACHE_TTL_SECONDS.
+CurrentUser = namedtuple("CurrentUser", "id email role first_name last_name client_id")
+
+USER_CACHE_TTL_SECONDS = 30
+USER_CACHE_MAX_SIZE = 10000
+_user_cache = {}
+_user_cache_lock = threading.Lock()
+
+def _forget_user(user_id: int) -> None:
+    """Drop cached token lookups for a user"""
+    with _user_cache_lock:
+        for key in [k for k, (_, user) in _user_cache.items() if user.id == user_id]:
+            del _user_cache[key]
 
 class AuthService:
     """JWT Authentication service"""
     
     def verify_password(self, plain_password: str, hashed_password: str) -> bool:
         """Verify a password against its hash"""
-        return pwd_context.verify(plain_password, hashed_password)
+        digest = _password_digest(plain_password)
+        now = time.monotonic()
+        
+        with _verify_cache_lock:
+            entry = _verify_cache.get(hashed_password)
+            if entry is not None:
+                cached_digest, expires = entry
+                if expires <= now:
+                    del _verify_cache[hashed_password]
+                elif hmac.compare_digest(cached_digest, digest):
+                    return True
+        
+        if not pwd_context.verify(plain_password, hashed_password):
+            return False
+        
+        with _verify_cache_lock:
+            if len(_verify_cache) >= VERIFY_CACHE_MAX_SIZE:
+                # Drop expired entries, then the oldest if still full
+                for stale in [k for k, (_, exp) in _verify_cache.items() if exp <= now]:
+                    del _verify_cache[stale]
+                if len(_verify_cache) >= VERIFY_CACHE_MAX_SIZE:
+                    del _verify_cache[next(iter(_verify_cache))]
+            _verify_cache[hashed_password] = (digest, now + VERIFY_CACHE_TTL_SECONDS)
+        
+        return True
     
     def get_password_hash(self, password: str) -> str:
         """Hash a password"""
         return pwd_context.hash(password)
     
-    def create_access_token(self, data: dict, expires_delta: timedelta = None) -> str:
+    def create_access_token(self, data: dict, expires_delta: timedelta = None,
+                            now: datetime = None) -> str:
         """Create JWT access token"""
         to_encode = data.copy()
+        now = now or datetime.utcnow()
         if expires_delta:
-            expire = datetime.utcnow() + expires_delta
+            expire = now + expires_delta
         else:
-            expire = datetime.utcnow() + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+            expire = now + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
         
         to_encode.update({"exp": expire, "type": "access"})
-        return jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
+        return jwt.encode(to_encode, _JWT_KEY, algorithm=settings.ALGORITHM)
     
-    def create_refresh_token(self, data: dict) -> str:
+    def create_refresh_token(self, data: dict, now: datetime = None) -> str:
         """Create JWT refresh token"""
         to_encode = data.copy()
-        expire = datetime.utcnow() + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
+        expire = (now or datetime.utcnow()) + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
         to_encode.update({"exp": expire, "type": "refresh"})
-        return jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
+        return jwt.encode(to_encode, _JWT_KEY, algorithm=settings.ALGORITHM)
     
     def decode_token(self, token: str) -> dict:
         """Decode and validate a JWT token"""
         try:
-            payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+            payload = jwt.decode(token, _JWT_KEY, algorithms=_JWT_ALGORITHMS)
             return payload
-        except JWTError:
+        except jwt.PyJWTError:
+            return None
+    
+    def get_user_from_token(self, db: Session, token: str) -> CurrentUser:
+        """Resolve an access token to an active user, or None"""
+        key = hashlib.sha256(token.encode("utf-8")).digest()
+        now = time.monotonic()
+        
+        with _user_cache_lock:
+            entry = _user_cache.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    return entry[1]
+                del _user_cache[key]
+        
+        payload = self.decode_token(token)
+        # Refresh tokens are only good at /auth/refresh, never as a credential
+        if not payload or payload.get("type") != "access":
+            return None
+        
+        user = db.get(User, payload.get("user_id"))
+        if not user or not user.is_active:
             return None
+        
+        snapshot = CurrentUser(
+            user.id, user.email, user.role, user.first_name, user.last_name, user.client_id
+        )
+        
+        # Never serve a cached user past the token's own expiry
+        ttl = min(USER_CACHE_TTL_SECONDS, payload["exp"] - time.time())
+        
+        with _user_cache_lock:
+            if len(_user_cache) >= USER_CACHE_MAX_SIZE:
+                # Drop expired entries, then the oldest if still full
+                for stale in [k for k, (exp, _) in _user_cache.items() if exp <= now]:
+                    del _user_cache[stale]
+                if len(_user_cache) >= USER_CACHE_MAX_SIZE:
+                    del _user_cache[next(iter(_user_cache))]
+            _user_cache[key] = (now + ttl, snapshot)
+        
+        return snapshot
     
     def register_user(self, db: Session, user_data: dict) -> dict:
         """Register a new user"""
         # Check if email exists
-        existing = db.query(User).filter(User.email == user_data["email"]).first()
-        if existing:
+        if db.query(exists().where(User.email == user_data["email"])).scalar():
             return {"success": False, "error": "Email already registered"}
         
         # Create user
@@ -113,11 +227,9 @@ class AuthService:
         )
         
         db.add(user)
-        db.commit()
-        db.refresh(user)
-        db.refresh(client)
+        db.flush()  # Get user.id for the audit log
         
-        # Create audit log
+        # Create audit log in the same transaction
         audit_log = AuditLog(
             user_id=user.id,
             action="client_registered",
@@ -125,17 +237,21 @@ class AuthService:
             ip_address=client_data.get("ip_address")
         )
         db.add(audit_log)
-        db.commit()
         
-        logger.info(f"Registered client: {client.email}")
-        
-        return {
+        # Capture the response before commit expires the loaded attributes
+        result = {
             "success": True,
             "client_id": client.id,
             "user_id": user.id,
             "email": user.email,
             "message": "Client registered successfully"
         }
+        
+        db.commit()
+        
+        logger.info(f"Registered client: {result['email']}")
+        
+        return result
     
     def login_user(self, db: Session, email: str, password: str, ip_address: str = None) -> dict:
         """Login a user"""
@@ -147,14 +263,9 @@ class AuthService:
         if not user.is_active:
             return {"success": False, "error": "Account is deactivated"}
         
-        # Update login info
-        user.last_login = datetime.utcnow()
-        user.login_count += 1
-        
-        # Create refresh token
-        refresh_token = self.create_refresh_token({"sub": user.email, "user_id": user.id})
-        user.refresh_token = refresh_token
-        user.refresh_token_expires = datetime.utcnow() + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
+        # Transparently migrate legacy bcrypt hashes to argon2id
+        if pwd_context.needs_update(user.password_hash):
+            user.password_hash = self.get_password_hash(password)
         
         # Create audit log
         audit_log = AuditLog(
@@ -163,14 +274,22 @@ class AuthService:
             ip_address=ip_address
         )
         db.add(audit_log)
-        db.commit()
         
-        # Create access token
-        access_token = self.create_access_token({"sub": user.email, "user_id": user.id, "role": user.role})
+        # Update login info
+        now = datetime.utcnow()
+        user.last_login = now
+        user.login_count += 1
         
-        logger.info(f"User logged in: {user.email}")
+        # Create tokens
+        refresh_token = self.create_refresh_token({"sub": user.email, "user_id": user.id}, now=now)
+        user.refresh_token = refresh_token
+        user.refresh_token_expires = now + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
+        access_token = self.create_access_token(
+            {"sub": user.email, "user_id": user.id, "role": user.role}, now=now
+        )
         
-        return {
+        # Capture the response before commit expires the loaded attributes
+        result = {
             "success": True,
             "access_token": access_token,
             "refresh_token": refresh_token,
@@ -184,6 +303,13 @@ class AuthService:
                 "client_id": user.client_id
             }
         }
+        
+        # Single commit flushes the user update and audit row together
+        db.commit()
+        
+        logger.info(f"User logged in: {result['user']['email']}")
+        
+        return result
     
     def refresh_access_token(self, db: Session, refresh_token: str) -> dict:
         """Refresh access token using refresh token"""
@@ -200,7 +326,8 @@ class AuthService:
         if not user or not user.is_active:
             return {"success": False, "error": "Invalid refresh token"}
         
-        if user.refresh_token_expires and user.refresh_token_expires < datetime.utcnow():
+        now = datetime.utcnow()
+        if user.refresh_token_expires and user.refresh_token_expires < now:
             return {"success": False, "error": "Refresh token expired"}
         
         # Create new access token
@@ -208,7 +335,7 @@ class AuthService:
             "sub": user.email,
             "user_id": user.id,
             "role": user.role
-        })
+        }, now=now)
         
         return {
             "success": True,
@@ -218,7 +345,7 @@ class AuthService:
     
     def change_password(self, db: Session, user_id: int, current_password: str, new_password: str) -> dict:
         """Change user password"""
-        user = db.query(User).get(user_id)
+        user = db.get(User, user_id)
         
         if not user:
             return {"success": False, "error": "User not found"}
@@ -228,6 +355,7 @@ class AuthService:
         
         user.password_hash = self.get_password_hash(new_password)
         db.commit()
+        _forget_user(user_id)
         
         logger.info(f"Password changed for user: {user.email}")
         
@@ -235,22 +363,24 @@ class AuthService:
     
     def request_password_reset(self, db: Session, email: str) -> dict:
         """Request password reset"""
-        user = db.query(User).filter(User.email == email).first()
-        
-        if not user:
+        # Set the token with a single UPDATE rather than loading the user
+        reset_token = User.generate_token()
+        updated = db.query(User).filter(User.email == email).update({
+            User.reset_token: reset_token,
+            User.reset_token_expires: datetime.utcnow() + timedelta(hours=1)
+        }, synchronize_session=False)
+        
+        if not updated:
             # Don't reveal if email exists
             return {"success": True, "message": "If this email exists, a reset link has been sent"}
         
-        # Generate reset token
-        user.reset_token = User.generate_token()
-        user.reset_token_expires = datetime.utcnow() + timedelta(hours=1)
         db.commit()
         
         logger.info(f"Password reset requested for: {email}")
         
         return {
             "success": True,
-            "reset_token": user.reset_token,
+            "reset_token": reset_token,
             "message": "Password reset token generated"
         }
     
@@ -268,6 +398,7 @@ class AuthService:
         user.reset_token = None
         user.reset_token_expires = None
         db.commit()
+        _forget_user(user.id)
         
         logger.info(f"Password reset completed for: {user.email}")
         
@@ -1,39 +1,21 @@
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Tuple
 from datetime import datetime
-from config import settings
+from types import MappingProxyType
+from jinja2 import DictLoader, Environment
+from config import settings, BureauInfo
 import logging
 
 logger = logging.getLogger(__name__)
 
-class LetterGenerator:
-    """Generate professional dispute letters"""
-    
-    def generate_letter(self, letter_type: str, dispute_data: Dict, client_data: Dict) -> str:
-        """Generate a dispute letter based on type"""
-        generators = {
-            "bureau_dispute": self._generate_bureau_dispute,
-            "debt_validation": self._generate_debt_validation,
-            "goodwill": self._generate_goodwill,
-            "direct_creditor": self._generate_direct_creditor,
-            "cfpb_warning": self._generate_cfpb_warning,
-            "method_of_verification": self._generate_mov_request,
-            "cease_desist": self._generate_cease_desist,
-            "section_605b": self._generate_section_605b
-        }
-        
-        generator = generators.get(letter_type, self._generate_bureau_dispute)
-        return generator(dispute_data, client_data)
-    
-    def _generate_bureau_dispute(self, dispute: Dict, client: Dict) -> str:
-        """Generate bureau dispute letter"""
-        bureau = dispute.get("bureau", "")
-        bureau_info = settings.BUREAU_INFO.get(bureau, {})
-        
-        letter = f"""{datetime.utcnow().strftime("%B %d, %Y")}
+# Letter bodies keyed by letter type. Every template gets today, client
+# and dispute; bureau letters also get bureau (a BureauInfo record)
+# and bureau_name.
+_LETTER_SOURCES = {
+    "bureau_dispute": """{{ today }}
 
-{bureau_info.get('name', bureau.upper())}
-{bureau_info.get('address', '')}
-{bureau_info.get('city_state_zip', '')}
+{{ bureau_name }}
+{{ bureau.address }}
+{{ bureau.city_state_zip }}
 
 Re: Formal Dispute of Inaccurate Credit Information
 Report #: [REPORT NUMBER]
@@ -43,23 +25,23 @@ To Whom It May Concern:
 I am writing pursuant to the Fair Credit Reporting Act (FCRA), 15 U.S.C. § 1681 et seq., to formally dispute the following inaccurate and/or incomplete information appearing in my credit file.
 
 CONSUMER INFORMATION:
-Name: {client.get('full_name', '')}
-Address: {client.get('address', '')}
-City, State ZIP: {client.get('city', '')}, {client.get('state', '')} {client.get('zip_code', '')}
-SSN: XXX-XX-{client.get('ssn_last_four', 'XXXX')}
-Date of Birth: {client.get('date_of_birth', '')}
+Name: {{ client.full_name }}
+Address: {{ client.address }}
+City, State ZIP: {{ client.city }}, {{ client.state }} {{ client.zip_code }}
+SSN: XXX-XX-{{ client.ssn_last_four|default('XXXX') }}
+Date of Birth: {{ client.date_of_birth }}
 
 DISPUTED ITEM(S):
 
-{self._format_disputed_items(dispute.get('disputed_items', []))}
+{{ disputed_items }}
 
 REASON FOR DISPUTE:
-{dispute.get('dispute_reason', 'The information is inaccurate and/or incomplete.')}
+{{ dispute.dispute_reason|default('The information is inaccurate and/or incomplete.') }}
 
 LEGAL BASIS:
 Under 15 U.S.C. § 1681i(a)(1)(A), you are required to conduct a reasonable investigation of this dispute within thirty (30) days of receipt. Pursuant to 15 U.S.C. § 1681e(b), you must follow reasonable procedures to assure maximum possible accuracy.
 
-{self._get_specific_legal_citation(dispute.get('error_type', ''))}
+{{ legal_citation }}
 
 REQUESTED ACTION:
 I respectfully request that you:
@@ -80,35 +62,31 @@ Thank you for your prompt attention to this matter.
 Sincerely,
 
 _____________________________
-{client.get('full_name', '')}
-Date: {datetime.utcnow().strftime("%B %d, %Y")}
+{{ client.full_name }}
+Date: {{ today }}
 
 ---
 SEND VIA CERTIFIED MAIL, RETURN RECEIPT REQUESTED
-"""
-        return letter
-    
-    def _generate_debt_validation(self, dispute: Dict, client: Dict) -> str:
-        """Generate debt validation letter"""
-        return f"""{datetime.utcnow().strftime("%B %d, %Y")}
+""",
+    "debt_validation": """{{ today }}
 
-{dispute.get('creditor_name', '[CREDITOR NAME]')}
+{{ dispute.creditor_name|default('[CREDITOR NAME]') }}
 [COLLECTION AGENCY ADDRESS]
 
 Re: Debt Validation Request
-Account #: {dispute.get('account_number', '[ACCOUNT NUMBER]')}
+Account #: {{ dispute.account_number|default('[ACCOUNT NUMBER]') }}
 
 To Whom It May Concern:
 
 I am writing pursuant to the Fair Debt Collection Practices Act (FDCPA), 15 U.S.C. § 1692g, to request validation of the alleged debt referenced above.
 
 CONSUMER INFORMATION:
-Name: {client.get('full_name', '')}
-Address: {client.get('full_address', '')}
+Name: {{ client.full_name }}
+Address: {{ client.full_address }}
 
 DEBT INFORMATION:
-Alleged Creditor: {dispute.get('creditor_name', '')}
-Account Number: {dispute.get('account_number', '')}
+Alleged Creditor: {{ dispute.creditor_name }}
+Account Number: {{ dispute.account_number }}
 Alleged Amount: [AMOUNT]
 
 VALIDATION REQUESTED:
@@ -133,23 +111,20 @@ Please govern yourselves accordingly.
 Sincerely,
 
 _____________________________
-{client.get('full_name', '')}
-Date: {datetime.utcnow().strftime("%B %d, %Y")}
+{{ client.full_name }}
+Date: {{ today }}
 
 ---
 SEND VIA CERTIFIED MAIL, RETURN RECEIPT REQUESTED
-"""
-    
-    def _generate_goodwill(self, dispute: Dict, client: Dict) -> str:
-        """Generate goodwill adjustment letter"""
-        return f"""{datetime.utcnow().strftime("%B %d, %Y")}
+""",
+    "goodwill": """{{ today }}
 
-{dispute.get('creditor_name', '[CREDITOR NAME]')}
+{{ dispute.creditor_name|default('[CREDITOR NAME]') }}
 Customer Service Department
 [Creditor Address]
 
 Re: Goodwill Adjustment Request
-Account #: {dispute.get('account_number', '[ACCOUNT NUMBER]')}
+Account #: {{ dispute.account_number|default('[ACCOUNT NUMBER]') }}
 
 To Whom It May Concern:
 
@@ -175,36 +150,33 @@ Thank you for your time and understanding.
 Sincerely,
 
 _____________________________
-{client.get('full_name', '')}
-Date: {datetime.utcnow().strftime("%B %d, %Y")}
+{{ client.full_name }}
+Date: {{ today }}
 
 ---
 SEND VIA CERTIFIED MAIL, RETURN RECEIPT REQUESTED
-"""
-    
-    def _generate_direct_creditor(self, dispute: Dict, client: Dict) -> str:
-        """Generate direct creditor dispute"""
-        return f"""{datetime.utcnow().strftime("%B %d, %Y")}
+""",
+    "direct_creditor": """{{ today }}
 
-{dispute.get('creditor_name', '[CREDITOR NAME]')}
+{{ dispute.creditor_name|default('[CREDITOR NAME]') }}
 Data Furnisher Department
 [Creditor Address]
 
 Re: Direct Dispute Under FCRA § 623
-Account #: {dispute.get('account_number', '[ACCOUNT NUMBER]')}
+Account #: {{ dispute.account_number|default('[ACCOUNT NUMBER]') }}
 
 To Whom It May Concern:
 
 I am writing pursuant to Section 623 of the Fair Credit Reporting Act (15 U.S.C. § 1681s-2) to dispute information you are furnishing to consumer reporting agencies.
 
 CONSUMER INFORMATION:
-Name: {client.get('full_name', '')}
-Address: {client.get('full_address', '')}
-SSN: XXX-XX-{client.get('ssn_last_four', 'XXXX')}
+Name: {{ client.full_name }}
+Address: {{ client.full_address }}
+SSN: XXX-XX-{{ client.ssn_last_four|default('XXXX') }}
 
 DISPUTED INFORMATION:
-Account: {dispute.get('account_number', '')}
-Issue: {dispute.get('dispute_reason', 'Inaccurate information')}
+Account: {{ dispute.account_number }}
+Issue: {{ dispute.dispute_reason|default('Inaccurate information') }}
 
 LEGAL OBLIGATION:
 Under 15 U.S.C. § 1681s-2(a)(1)(A), you are required to report accurate information. Section 1681s-2(a)(1)(B) requires you to correct and update information. Additionally, 15 U.S.C. § 1681s-2(b) imposes specific duties upon receipt of a dispute.
@@ -221,23 +193,17 @@ I request written confirmation of your actions within 30 days.
 Sincerely,
 
 _____________________________
-{client.get('full_name', '')}
-Date: {datetime.utcnow().strftime("%B %d, %Y")}
+{{ client.full_name }}
+Date: {{ today }}
 
 ---
 SEND VIA CERTIFIED MAIL, RETURN RECEIPT REQUESTED
-"""
-    
-    def _generate_cfpb_warning(self, dispute: Dict, client: Dict) -> str:
-        """Generate CFPB warning letter"""
-        bureau = dispute.get("bureau", "")
-        bureau_info = settings.BUREAU_INFO.get(bureau, {})
-        
-        return f"""{datetime.utcnow().strftime("%B %d, %Y")}
+""",
+    "cfpb_warning": """{{ today }}
 
-{bureau_info.get('name', bureau.upper())}
-{bureau_info.get('address', '')}
-{bureau_info.get('city_state_zip', '')}
+{{ bureau_name }}
+{{ bureau.address }}
+{{ bureau.city_state_zip }}
 
 Re: Final Notice Before CFPB Complaint
 Previous Dispute Dates: [DATES]
@@ -251,7 +217,7 @@ This is my [SECOND/THIRD] attempt to resolve inaccurate information in my credit
 □ Respond within 30 days as required by law
 
 PREVIOUS DISPUTES:
-{self._format_previous_disputes(dispute.get('previous_attempts', []))}
+{{ previous_disputes }}
 
 LEGAL VIOLATIONS:
 Your failure to comply may constitute violations of:
@@ -270,23 +236,17 @@ This is your final opportunity to comply voluntarily.
 Sincerely,
 
 _____________________________
-{client.get('full_name', '')}
-Date: {datetime.utcnow().strftime("%B %d, %Y")}
+{{ client.full_name }}
+Date: {{ today }}
 
 ---
 SEND VIA CERTIFIED MAIL, RETURN RECEIPT REQUESTED
-"""
-    
-    def _generate_mov_request(self, dispute: Dict, client: Dict) -> str:
-        """Generate Method of Verification request"""
-        bureau = dispute.get("bureau", "")
-        bureau_info = settings.BUREAU_INFO.get(bureau, {})
-        
-        return f"""{datetime.utcnow().strftime("%B %d, %Y")}
+""",
+    "method_of_verification": """{{ today }}
 
-{bureau_info.get('name', bureau.upper())}
-{bureau_info.get('address', '')}
-{bureau_info.get('city_state_zip', '')}
+{{ bureau_name }}
+{{ bureau.address }}
+{{ bureau.city_state_zip }}
 
 Re: Method of Verification Request - FCRA § 611(a)(7)
 Original Dispute Date: [DATE]
@@ -298,7 +258,7 @@ I previously disputed inaccurate information in my credit file (dispute sent [DA
 Pursuant to 15 U.S.C. § 1681i(a)(7), I hereby request the method of verification used:
 
 DISPUTED ITEM:
-{dispute.get('dispute_description', '[ITEM DESCRIPTION]')}
+{{ dispute.dispute_description|default('[ITEM DESCRIPTION]') }}
 
 REQUESTED INFORMATION:
 1. The name of the furnisher who verified the information
@@ -315,22 +275,19 @@ Your failure to provide this information will constitute a violation of the FCRA
 Sincerely,
 
 _____________________________
-{client.get('full_name', '')}
-Date: {datetime.utcnow().strftime("%B %d, %Y")}
+{{ client.full_name }}
+Date: {{ today }}
 
 ---
 SEND VIA CERTIFIED MAIL, RETURN RECEIPT REQUESTED
-"""
-    
-    def _generate_cease_desist(self, dispute: Dict, client: Dict) -> str:
-        """Generate cease and desist letter"""
-        return f"""{datetime.utcnow().strftime("%B %d, %Y")}
+""",
+    "cease_desist": """{{ today }}
 
-{dispute.get('creditor_name', '[COLLECTION AGENCY]')}
+{{ dispute.creditor_name|default('[COLLECTION AGENCY]') }}
 [Address]
 
 Re: Cease and Desist - FDCPA § 1692c(c)
-Account #: {dispute.get('account_number', '[ACCOUNT NUMBER]')}
+Account #: {{ dispute.account_number|default('[ACCOUNT NUMBER]') }}
 
 To Whom It May Concern:
 
@@ -355,37 +312,31 @@ Please govern yourselves accordingly.
 Sincerely,
 
 _____________________________
-{client.get('full_name', '')}
-Date: {datetime.utcnow().strftime("%B %d, %Y")}
+{{ client.full_name }}
+Date: {{ today }}
 
 ---
 SEND VIA CERTIFIED MAIL, RETURN RECEIPT REQUESTED
-"""
-    
-    def _generate_section_605b(self, dispute: Dict, client: Dict) -> str:
-        """Generate Section 605B identity theft block request"""
-        bureau = dispute.get("bureau", "")
-        bureau_info = settings.BUREAU_INFO.get(bureau, {})
-        
-        return f"""{datetime.utcnow().strftime("%B %d, %Y")}
+""",
+    "section_605b": """{{ today }}
 
-{bureau_info.get('name', bureau.upper())}
-{bureau_info.get('address', '')}
-{bureau_info.get('city_state_zip', '')}
+{{ bureau_name }}
+{{ bureau.address }}
+{{ bureau.city_state_zip }}
 
 Re: Identity Theft Block Request - FCRA § 605B
-Fraudulent Account: {dispute.get('account_number', '[ACCOUNT NUMBER]')}
-Creditor: {dispute.get('creditor_name', '[CREDITOR NAME]')}
+Fraudulent Account: {{ dispute.account_number|default('[ACCOUNT NUMBER]') }}
+Creditor: {{ dispute.creditor_name|default('[CREDITOR NAME]') }}
 
 To Whom It May Concern:
 
 I am a victim of identity theft. The above-referenced account was fraudulently opened in my name without my authorization.
 
 VICTIM INFORMATION:
-Name: {client.get('full_name', '')}
-Address: {client.get('full_address', '')}
-SSN: XXX-XX-{client.get('ssn_last_four', 'XXXX')}
-Date of Birth: {client.get('date_of_birth', '')}
+Name: {{ client.full_name }}
+Address: {{ client.full_address }}
+SSN: XXX-XX-{{ client.ssn_last_four|default('XXXX') }}
+Date of Birth: {{ client.date_of_birth }}
 
 FRAUD DETAILS:
 □ I did not open this account
@@ -409,45 +360,192 @@ Please confirm the block within 5 business days.
 Sincerely,
 
 _____________________________
-{client.get('full_name', '')}
-Date: {datetime.utcnow().strftime("%B %d, %Y")}
+{{ client.full_name }}
+Date: {{ today }}
 
 ---
 SEND VIA CERTIFIED MAIL, RETURN RECEIPT REQUESTED
 """
+}
+
+# Compiled once at import; rendering only walks the precompiled template
+_env = Environment(
+    loader=DictLoader(_LETTER_SOURCES),
+    autoescape=False,
+    trim_blocks=True,
+    lstrip_blocks=True,
+    keep_trailing_newline=True
+)
+_TEMPLATES = {letter_type: _env.get_template(letter_type) for letter_type in _LETTER_SOURCES}
+
+# Blank address block for letters to an unrecognised bureau
+_UNKNOWN_BUREAU = BureauInfo(*[""] * len(BureauInfo._fields))
+
+# Legal citation per error type for bureau dispute letters
+_CITATIONS = MappingProxyType({
+    "outdated_negative": "15 U.S.C. § 1681a(1) - Items older than 7 years must be removed",
+    "outdated_inquiry": "15 U.S.C. § 1681a(3) - Inquiries older than 2 years must be removed",
+    "balance_exceeds_limit": "15 U.S.C. § 1681s-2(a)(1) - Furnishers must report accurate information",
+    "duplicate_account": "15 U.S.C. § 1681e(b) - Reporting must be accurate",
+    "identity_theft": "15 U.S.C. § 1681c-2 - Identity theft block required"
+})
+_DEFAULT_CITATION = "15 U.S.C. § 1681i - Right to dispute inaccurate information"
+
+def _today() -> str:
+    """Letter date line, e.g. 'January 05, 2025'"""
+    return datetime.utcnow().strftime("%B %d, %Y")
+
+class LetterGenerator:
+    """Generate professional dispute letters"""
+    
+    __slots__ = ()
     
-    def _format_disputed_items(self, items: List[Dict]) -> str:
+    @staticmethod
+    def generate_letter(letter_type: str, dispute_data: Dict, client_data: Dict) -> str:
+        """Generate a dispute letter based on type"""
+        generator = LetterGenerator._GENERATORS.get(letter_type, LetterGenerator._generate_bureau_dispute)
+        return generator(dispute_data, client_data, _today())
+    
+    @staticmethod
+    def generate_letters_bulk(jobs: List[Tuple[str, Dict, Dict]]) -> List[str]:
+        """Generate letters for (letter_type, dispute_data, client_data) jobs, in order"""
+        today = _today()
+        generators = LetterGenerator._GENERATORS
+        default = LetterGenerator._generate_bureau_dispute
+        return [
+            generators.get(letter_type, default)(dispute_data, client_data, today)
+            for letter_type, dispute_data, client_data in jobs
+        ]
+    
+    @staticmethod
+    def _generate_bureau_dispute(dispute: Dict, client: Dict, today: str) -> str:
+        """Generate bureau dispute letter"""
+        return _TEMPLATES["bureau_dispute"].render(
+            LetterGenerator._bureau_context(dispute),
+            today=today,
+            client=client,
+            dispute=dispute,
+            disputed_items=LetterGenerator._format_disputed_items(dispute.get('disputed_items', [])),
+            legal_citation=LetterGenerator._get_specific_legal_citation(dispute.get('error_type', ''))
+        )
+    
+    @staticmethod
+    def _generate_debt_validation(dispute: Dict, client: Dict, today: str) -> str:
+        """Generate debt validation letter"""
+        return _TEMPLATES["debt_validation"].render(
+            today=today,
+            client=client,
+            dispute=dispute
+        )
+    
+    @staticmethod
+    def _generate_goodwill(dispute: Dict, client: Dict, today: str) -> str:
+        """Generate goodwill adjustment letter"""
+        return _TEMPLATES["goodwill"].render(
+            today=today,
+            client=client,
+            dispute=dispute
+        )
+    
+    @staticmethod
+    def _generate_direct_creditor(dispute: Dict, client: Dict, today: str) -> str:
+        """Generate direct creditor dispute"""
+        return _TEMPLATES["direct_creditor"].render(
+            today=today,
+            client=client,
+            dispute=dispute
+        )
+    
+    @staticmethod
+    def _generate_cfpb_warning(dispute: Dict, client: Dict, today: str) -> str:
+        """Generate CFPB warning letter"""
+        return _TEMPLATES["cfpb_warning"].render(
+            LetterGenerator._bureau_context(dispute),
+            today=today,
+            client=client,
+            dispute=dispute,
+            previous_disputes=LetterGenerator._format_previous_disputes(dispute.get('previous_attempts', []))
+        )
+    
+    @staticmethod
+    def _generate_mov_request(dispute: Dict, client: Dict, today: str) -> str:
+        """Generate Method of Verification request"""
+        return _TEMPLATES["method_of_verification"].render(
+            LetterGenerator._bureau_context(dispute),
+            today=today,
+            client=client,
+            dispute=dispute
+        )
+    
+    @staticmethod
+    def _generate_cease_desist(dispute: Dict, client: Dict, today: str) -> str:
+        """Generate cease and desist letter"""
+        return _TEMPLATES["cease_desist"].render(
+            today=today,
+            client=client,
+            dispute=dispute
+        )
+    
+    @staticmethod
+    def _generate_section_605b(dispute: Dict, client: Dict, today: str) -> str:
+        """Generate Section 605B identity theft block request"""
+        return _TEMPLATES["section_605b"].render(
+            LetterGenerator._bureau_context(dispute),
+            today=today,
+            client=client,
+            dispute=dispute
+        )
+    
+    # Letter type -> generator, built once with the class
+    _GENERATORS = {
+        "bureau_dispute": _generate_bureau_dispute,
+        "debt_validation": _generate_debt_validation,
+        "goodwill": _generate_goodwill,
+        "direct_creditor": _generate_direct_creditor,
+        "cfpb_warning": _generate_cfpb_warning,
+        "method_of_verification": _generate_mov_request,
+        "cease_desist": _generate_cease_desist,
+        "section_605b": _generate_section_605b
+    }
+    
+    @staticmethod
+    def _bureau_context(dispute: Dict) -> Dict:
+        """Template variables for the bureau a letter is addressed to"""
+        bureau = dispute.get("bureau", "")
+        bureau_info = settings.BUREAUS.get(bureau)
+        if bureau_info is None:
+            return {"bureau": _UNKNOWN_BUREAU, "bureau_name": bureau.upper()}
+        return {"bureau": bureau_info, "bureau_name": bureau_info.name}
+    
+    @staticmethod
+    def _format_disputed_items(items: List[Dict]) -> str:
         """Format disputed items for letter"""
         if not items:
             return "[ITEM DETAILS TO BE INSERTED]"
         
-        formatted = []
-        for i, item in enumerate(items, 1):
-            formatted.append(f"""
-Item {i}:
-- Creditor: {item.get('creditor_name', '')}
-- Account #: {item.get('account_number', '')}
-- Reason: {item.get('reason', '')}
-""")
-        return "\n".join(formatted)
+        return "\n".join(
+            f"\nItem {i}:\n"
+            f"- Creditor: {item.get('creditor_name', '')}\n"
+            f"- Account #: {item.get('account_number', '')}\n"
+            f"- Reason: {item.get('reason', '')}\n"
+            for i, item in enumerate(items, 1)
+        )
     
-    def _format_previous_disputes(self, attempts: List[Dict]) -> str:
+    @staticmethod
+    def _format_previous_disputes(attempts: List[Dict]) -> str:
         """Format previous dispute attempts"""
         if not attempts:
             return "□ [Previous dispute information]"
         
-        formatted = []
-        for attempt in attempts:
-            formatted.append(f"□ {attempt.get('date', '')} - {attempt.get('method', '')}")
-        return "\n".join(formatted)
+        return "\n".join(
+            f"□ {attempt.get('date', '')} - {attempt.get('method', '')}" for attempt in attempts
+        )
     
-    def _get_specific_legal_citation(self, error_type: str) -> str:
+    @staticmethod
+    def _get_specific_legal_citation(error_type: str) -> str:
         """Get specific legal citation based on error type"""
-        citations = {
-            "outdated_negative": "15 U.S.C. § 1681a(1) - Items older than 7 years must be removed",
-            "outdated_inquiry": "15 U.S.C. § 1681a(3) - Inquiries older than 2 years must be removed",
-            "balance_exceeds_limit": "15 U.S.C. § 1681s-2(a)(1) - Furnishers must report accurate information",
-            "duplicate_account": "15 U.S.C. § 1681e(b) - Reporting must be accurate",
-            "identity_theft": "15 U.S.C. § 1681c-2 - Identity theft block required"
-        }
-        return citations.get(error_type, "15 U.S.C. § 1681i - Right to dispute inaccurate information")
\ No newline at end of file
+        return _CITATIONS.get(error_type, _DEFAULT_CITATION)
+
+# Module-level entry points; LetterGenerator holds no per-instance state
+generate_letter = LetterGenerator.generate_letter
+generate_letters_bulk = LetterGenerator.generate_letters_bulk
@@ -1,31 +1,54 @@
+from anyio import to_thread
 from fastapi import FastAPI, Depends, HTTPException, status, UploadFile, File, Form, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, defer, selectinload
 from typing import List, Optional
+import hashlib
 import os
-import shutil
+import tempfile
+import uuid
+from collections import defaultdict
+from contextlib import asynccontextmanager, suppress
 from datetime import datetime
 
-from database import engine, Base, get_db
+from database import get_db, init_db
 from config import settings
 from models import *
-from auth.auth_service import AuthService
+from auth.auth_service import AuthService, CurrentUser
 from parsers.ocr_integration import OCRIntegration
+from parsers.pdf_parser import shutdown_table_pool
 from analyzers.error_detector import ErrorDetector
 from dispute_engine.strategy_builder import StrategyBuilder
 from dispute_engine.letter_generator import LetterGenerator
 from services.email_service import EmailService
 from services.stripe_service import StripeService
+from services.storage_service import StorageService
 from services.notification_scheduler import NotificationScheduler
 
-# Create database tables
-Base.metadata.create_all(bind=engine)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Create database tables at startup rather than on import
+    if settings.AUTO_CREATE_SCHEMA:
+        init_db()
+    # Sync routes run on anyio's worker threads (40 by default); allow as
+    # many concurrent requests as the connection pool can serve
+    to_thread.current_default_thread_limiter().total_tokens = (
+        settings.DB_POOL_SIZE + settings.DB_MAX_OVERFLOW
+    )
+    yield
+    # Table-extraction workers are started on the first long report
+    shutdown_table_pool()
 
 app = FastAPI(
     title=settings.APP_NAME,
     version=settings.VERSION,
-    description="Credit Repair SaaS API"
+    description="Credit Repair SaaS API",
+    default_response_class=ORJSONResponse,  # Large parsed_data/errors payloads
+    lifespan=lifespan
 )
 
 # CORS middleware
@@ -37,6 +60,12 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Uploads are copied to disk in 1 MiB reads
+UPLOAD_CHUNK_SIZE = 1 << 20
+
+# Stripe event payloads are well under this; anything larger is rejected
+MAX_WEBHOOK_BODY_BYTES = 1 << 20
+
 # Security
 security = HTTPBearer()
 auth_service = AuthService()
@@ -46,27 +75,23 @@ strategy_builder = StrategyBuilder()
 letter_generator = LetterGenerator()
 email_service = EmailService()
 stripe_service = StripeService()
+storage_service = StorageService()
 
 # ========== Dependencies ==========
 
-async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security), db: Session = Depends(get_db)):
-    token = credentials.credentials
-    payload = auth_service.decode_token(token)
-    if not payload:
-        raise HTTPException(status_code=401, detail="Invalid token")
-    
-    user = db.query(User).filter(User.id == payload.get("user_id")).first()
-    if not user or not user.is_active:
-        raise HTTPException(status_code=401, detail="User not found or inactive")
+def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security), db: Session = Depends(get_db)) -> CurrentUser:
+    user = auth_service.get_user_from_token(db, credentials.credentials)
+    if not user:
+        raise HTTPException(status_code=401, detail="Invalid token or inactive user")
     
     return user
 
-async def require_admin(current_user: User = Depends(get_current_user)):
+async def require_admin(current_user: CurrentUser = Depends(get_current_user)):
     if current_user.role != "admin":
         raise HTTPException(status_code=403, detail="Admin access required")
     return current_user
 
-async def require_staff(current_user: User = Depends(get_current_user)):
+async def require_staff(current_user: CurrentUser = Depends(get_current_user)):
     if current_user.role not in ["admin", "staff"]:
         raise HTTPException(status_code=403, detail="Staff access required")
     return current_user
@@ -120,7 +145,7 @@ def reset_password(data: dict, db: Session = Depends(get_db)):
 @app.post("/api/auth/change-password")
 def change_password(
     data: dict,
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Change password"""
@@ -132,7 +157,7 @@ def change_password(
     )
 
 @app.get("/api/auth/me")
-def get_me(current_user: User = Depends(get_current_user)):
+def get_me(current_user: CurrentUser = Depends(get_current_user)):
     """Get current user info"""
     return {
         "id": current_user.id,
@@ -144,7 +169,7 @@ def get_me(current_user: User = Depends(get_current_user)):
     }
 
 @app.get("/api/auth/notifications")
-def get_notifications(current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+def get_notifications(current_user: CurrentUser = Depends(get_current_user), db: Session = Depends(get_db)):
     """Get user notifications"""
     notifications = db.query(Notification).filter(
         Notification.user_id == current_user.id
@@ -154,7 +179,7 @@ def get_notifications(current_user: User = Depends(get_current_user), db: Sessio
 @app.post("/api/auth/admin/create-client-account")
 def admin_create_client(
     client_data: dict,
-    admin: User = Depends(require_admin),
+    admin: CurrentUser = Depends(require_admin),
     db: Session = Depends(get_db)
 ):
     """Admin creates client account"""
@@ -166,17 +191,23 @@ def admin_create_client(
 def get_clients(
     skip: int = 0,
     limit: int = 100,
-    staff: User = Depends(require_staff),
+    staff: CurrentUser = Depends(require_staff),
     db: Session = Depends(get_db)
 ):
     """Get all clients (staff/admin only)"""
-    clients = db.query(Client).offset(skip).limit(limit).all()
-    return {"clients": clients, "total": db.query(Client).count()}
+    # Page and total in one round trip via a window count
+    rows = db.query(Client, func.count().over()).offset(skip).limit(limit).all()
+    if rows:
+        total = rows[0][1]
+    else:
+        # Past the last page the window has no rows to report the total on
+        total = db.query(Client).count() if skip else 0
+    return {"clients": [client for client, _ in rows], "total": total}
 
 @app.post("/api/clients")
 def create_client(
     client_data: dict,
-    staff: User = Depends(require_staff),
+    staff: CurrentUser = Depends(require_staff),
     db: Session = Depends(get_db)
 ):
     """Create a new client (staff/admin only)"""
@@ -189,7 +220,7 @@ def create_client(
 @app.get("/api/clients/{client_id}")
 def get_client(
     client_id: int,
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Get client details"""
@@ -197,7 +228,12 @@ def get_client(
     if current_user.role == "client" and current_user.client_id != client_id:
         raise HTTPException(status_code=403, detail="Access denied")
     
-    client = db.query(Client).get(client_id)
+    # Load both collections up front: one query each instead of lazy loads
+    client = db.get(
+        Client,
+        client_id,
+        options=[selectinload(Client.credit_reports), selectinload(Client.disputes)]
+    )
     if not client:
         raise HTTPException(status_code=404, detail="Client not found")
     
@@ -209,27 +245,35 @@ def get_client(
 
 # ========== Credit Report Routes ==========
 
-@app.post("/api/credit-reports/upload")
-async def upload_credit_report(
-    file: UploadFile = File(...),
-    bureau: str = Form(None),
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
-):
-    """Upload and process a credit report"""
-    if not current_user.client_id:
-        raise HTTPException(status_code=400, detail="User not associated with a client")
-    
-    # Save file
-    upload_dir = "uploads/credit_reports"
-    os.makedirs(upload_dir, exist_ok=True)
-    
-    file_path = f"{upload_dir}/{datetime.utcnow().timestamp()}_{file.filename}"
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+def _ingest_credit_report(db: Session, client_id: int, local_path: str, stored_path: str,
+                          filename: str, file_size: int, content_type: str, bureau: str = None,
+                          content_hash: str = None):
+    """Parse a stored report file and persist the report with its accounts"""
+    # Identical re-uploads reuse the earlier report instead of re-running OCR
+    if content_hash:
+        existing = db.query(
+            CreditReport.id, CreditReport.total_accounts, CreditReport.equifax_score,
+            CreditReport.experian_score, CreditReport.transunion_score
+        ).filter(
+            CreditReport.client_id == client_id,
+            CreditReport.content_hash == content_hash
+        ).first()
+        if existing:
+            return {
+                "message": "Report already uploaded",
+                "report_id": existing.id,
+                "accounts_found": existing.total_accounts,
+                "scores": {
+                    bureau_name: score for bureau_name, score in (
+                        ("equifax", existing.equifax_score),
+                        ("experian", existing.experian_score),
+                        ("transunion", existing.transunion_score)
+                    ) if score is not None
+                }
+            }
     
     # Process with OCR/PDF parser
-    result = ocr_integration.process_upload(file_path, file.content_type)
+    result = ocr_integration.process_upload(local_path, content_type)
     
     if not result["success"]:
         raise HTTPException(status_code=400, detail="Failed to process file")
@@ -237,10 +281,11 @@ async def upload_credit_report(
     # Create credit report record
     report_data = result["data"]
     credit_report = CreditReport(
-        client_id=current_user.client_id,
-        file_path=file_path,
-        original_filename=file.filename,
-        file_size=os.path.getsize(file_path),
+        client_id=client_id,
+        file_path=stored_path,
+        original_filename=filename,
+        file_size=file_size,
+        content_hash=content_hash,
         bureau=report_data.get("bureau", bureau),
         raw_text=report_data.get("raw_text", ""),
         parsed_data=report_data,
@@ -252,31 +297,117 @@ async def upload_credit_report(
     )
     
     db.add(credit_report)
-    db.commit()
-    db.refresh(credit_report)
-    
-    # Create accounts
-    for account_data in report_data.get("accounts", []):
-        account = CreditAccount(
-            report_id=credit_report.id,
-            client_id=current_user.client_id,
-            **account_data
-        )
-        db.add(account)
+    db.flush()  # Get credit_report.id without committing
+    report_id = credit_report.id
+    
+    # Create accounts with one multi-row INSERT instead of an ORM object each
+    db.bulk_insert_mappings(CreditAccount, [
+        {"report_id": report_id, "client_id": client_id, **account_data}
+        for account_data in report_data.get("accounts", [])
+    ])
     
     db.commit()
     
     return {
         "message": "Report uploaded successfully",
-        "report_id": credit_report.id,
+        "report_id": report_id,
         "accounts_found": len(report_data.get("accounts", [])),
         "scores": report_data.get("scores", {})
     }
 
+@app.post("/api/credit-reports/upload")
+def upload_credit_report(
+    file: UploadFile = File(...),
+    bureau: str = Form(None),
+    current_user: CurrentUser = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Upload and process a credit report"""
+    if not current_user.client_id:
+        raise HTTPException(status_code=400, detail="User not associated with a client")
+    
+    # Save file; per-client directory so identical content from two
+    # clients never shares (or overwrites) one path
+    upload_dir = f"uploads/credit_reports/{current_user.client_id}"
+    os.makedirs(upload_dir, exist_ok=True)
+    
+    # Hash while streaming; a client's identical uploads land on the same path
+    partial_path = f"{upload_dir}/.{uuid.uuid4().hex}.part"
+    file_size = 0
+    digest = hashlib.sha256()
+    try:
+        with open(partial_path, "wb") as buffer:
+            while chunk := file.file.read(UPLOAD_CHUNK_SIZE):
+                buffer.write(chunk)
+                digest.update(chunk)
+                file_size += len(chunk)
+        
+        content_hash = digest.hexdigest()
+        file_path = f"{upload_dir}/{content_hash}{os.path.splitext(file.filename or '')[1]}"
+        os.replace(partial_path, file_path)
+    except Exception:
+        # Don't leave a half-written upload behind
+        with suppress(FileNotFoundError):
+            os.unlink(partial_path)
+        raise
+    
+    return _ingest_credit_report(
+        db, current_user.client_id, file_path, file_path,
+        file.filename, file_size, file.content_type, bureau, content_hash
+    )
+
+@app.post("/api/credit-reports/presign")
+def presign_credit_report_upload(
+    data: dict,
+    current_user: CurrentUser = Depends(get_current_user)
+):
+    """Issue a presigned S3 PUT so report bytes bypass the API"""
+    if not current_user.client_id:
+        raise HTTPException(status_code=400, detail="User not associated with a client")
+    
+    filename = os.path.basename(data.get("filename") or "report.pdf")
+    key = f"credit_reports/{current_user.client_id}/{uuid.uuid4().hex}_{filename}"
+    result = storage_service.create_upload_url(key, data.get("content_type") or "application/pdf")
+    
+    if not result["success"]:
+        raise HTTPException(status_code=502, detail="Could not create upload URL")
+    
+    return {"url": result["url"], "key": result["key"]}
+
+@app.post("/api/credit-reports/finalize")
+def finalize_credit_report_upload(
+    data: dict,
+    current_user: CurrentUser = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Record and process a report uploaded via a presigned URL"""
+    if not current_user.client_id:
+        raise HTTPException(status_code=400, detail="User not associated with a client")
+    
+    key = data.get("key") or ""
+    if not key.startswith(f"credit_reports/{current_user.client_id}/"):
+        raise HTTPException(status_code=403, detail="Access denied")
+    
+    filename = key.rsplit("/", 1)[-1].split("_", 1)[-1]
+    suffix = os.path.splitext(filename)[1]
+    with tempfile.NamedTemporaryFile(suffix=suffix) as tmp:
+        result = storage_service.download(key, tmp.name)
+        if not result["success"]:
+            raise HTTPException(status_code=400, detail="Uploaded file not found")
+        
+        with open(tmp.name, "rb") as downloaded:
+            content_hash = hashlib.file_digest(downloaded, "sha256").hexdigest()
+        
+        return _ingest_credit_report(
+            db, current_user.client_id, tmp.name, storage_service.s3_uri(key),
+            filename, os.path.getsize(tmp.name), data.get("content_type"), data.get("bureau"),
+            content_hash
+        )
+
 @app.post("/api/credit-reports/{report_id}/analyze")
 def analyze_credit_report(
     report_id: int,
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Run error analysis on a credit report"""
@@ -320,10 +451,13 @@ def analyze_credit_report(
     report.analysis_complete = True
     report.analysis_date = datetime.utcnow()
     
-    # Update accounts with error flags
+    # Update accounts with error flags, bucketing errors by account number once
+    errors_by_account = defaultdict(list)
+    for e in analysis["errors"]:
+        errors_by_account[(e.get("account") or {}).get("account_number")].append(e)
+    
     for account in accounts:
-        account_errors = [e for e in analysis["errors"] 
-                         if e.get("account", {}).get("account_number") == account.account_number]
+        account_errors = errors_by_account.get(account.account_number)
         if account_errors:
             account.has_errors = True
             account.errors = account_errors
@@ -341,7 +475,7 @@ def analyze_credit_report(
 @app.get("/api/disputes/strategy")
 def get_dispute_strategy(
     report_id: int,
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Get dispute strategy for a report"""
@@ -352,7 +486,7 @@ def get_dispute_strategy(
     if current_user.role == "client" and report.client_id != current_user.client_id:
         raise HTTPException(status_code=403, detail="Access denied")
     
-    client = db.query(Client).get(report.client_id)
+    client = db.get(Client, report.client_id)
     
     errors = report.errors_found or []
     strategy = strategy_builder.build_strategy(errors, {"id": client.id, "full_name": client.full_name})
@@ -362,24 +496,35 @@ def get_dispute_strategy(
 @app.post("/api/disputes/generate-letters")
 def generate_dispute_letters(
     data: dict,
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Generate dispute letters"""
     dispute_ids = data.get("dispute_ids", [])
     letters = []
     
+    # Load all requested disputes and their clients in two queries
+    disputes_by_id = {
+        dispute.id: dispute
+        for dispute in db.query(Dispute)
+        .options(selectinload(Dispute.client))
+        .filter(Dispute.id.in_(dispute_ids))
+    }
+    
+    selected = []
+    jobs = []
     for dispute_id in dispute_ids:
-        dispute = db.query(Dispute).get(dispute_id)
+        dispute = disputes_by_id.get(dispute_id)
         if not dispute:
             continue
         
         if current_user.role == "client" and dispute.client_id != current_user.client_id:
             continue
         
-        client = db.query(Client).get(dispute.client_id)
+        client = dispute.client
         
-        letter_content = letter_generator.generate_letter(
+        selected.append(dispute)
+        jobs.append((
             dispute.strategy or "bureau_dispute",
             {
                 "bureau": dispute.bureau,
@@ -398,10 +543,13 @@ def generate_dispute_letters(
                 "ssn_last_four": client.ssn_last_four,
                 "date_of_birth": client.date_of_birth
             }
-        )
-        
+        ))
+    
+    # Render the whole batch in one pass, then apply the results
+    generated_at = datetime.utcnow()
+    for dispute, letter_content in zip(selected, letter_generator.generate_letters_bulk(jobs)):
         dispute.letter_content = letter_content
-        dispute.letter_generated_date = datetime.utcnow()
+        dispute.letter_generated_date = generated_at
         dispute.status = "generated"
         
         letters.append({
@@ -418,30 +566,35 @@ def generate_dispute_letters(
 
 @app.get("/api/client/dashboard")
 def get_client_dashboard(
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Get client dashboard data"""
     if not current_user.client_id:
         raise HTTPException(status_code=400, detail="Not a client account")
     
-    client = db.query(Client).get(current_user.client_id)
+    client = db.get(Client, current_user.client_id)
     
     # Get latest scores
-    latest_report = db.query(CreditReport).filter(
+    latest_scores = db.query(
+        CreditReport.equifax_score,
+        CreditReport.experian_score,
+        CreditReport.transunion_score
+    ).filter(
         CreditReport.client_id == client.id
     ).order_by(CreditReport.upload_date.desc()).first()
     
-    # Count disputes
-    active_disputes = db.query(Dispute).filter(
-        Dispute.client_id == client.id,
-        Dispute.status.in_(["pending", "generated", "sent"])
-    ).count()
+    # Report totals, aggregated in the database
+    total_reports, total_errors = db.query(
+        func.count(CreditReport.id),
+        func.coalesce(func.sum(CreditReport.total_errors), 0)
+    ).filter(CreditReport.client_id == client.id).one()
     
-    completed_disputes = db.query(Dispute).filter(
-        Dispute.client_id == client.id,
-        Dispute.status == "resolved"
-    ).count()
+    # Count disputes in a single pass
+    active_disputes, completed_disputes = db.query(
+        func.count().filter(Dispute.status.in_(["pending", "generated", "sent"])),
+        func.count().filter(Dispute.status == "resolved")
+    ).filter(Dispute.client_id == client.id).one()
     
     return {
         "client": {
@@ -450,28 +603,34 @@ def get_client_dashboard(
             "email": client.email
         },
         "credit_scores": {
-            "equifax": latest_report.equifax_score if latest_report else None,
-            "experian": latest_report.experian_score if latest_report else None,
-            "transunion": latest_report.transunion_score if latest_report else None
+            "equifax": latest_scores.equifax_score if latest_scores else None,
+            "experian": latest_scores.experian_score if latest_scores else None,
+            "transunion": latest_scores.transunion_score if latest_scores else None
         },
         "stats": {
-            "total_reports": len(client.credit_reports),
+            "total_reports": total_reports,
             "active_disputes": active_disputes,
             "completed_disputes": completed_disputes,
-            "total_errors": sum(r.total_errors for r in client.credit_reports)
+            "total_errors": total_errors
         }
     }
 
 @app.get("/api/client/reports")
 def get_client_reports(
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Get client's credit reports"""
     if not current_user.client_id:
         raise HTTPException(status_code=400, detail="Not a client account")
     
-    reports = db.query(CreditReport).filter(
+    # List view: leave the document text and analysis blobs unloaded
+    reports = db.query(CreditReport).options(
+        defer(CreditReport.raw_text),
+        defer(CreditReport.parsed_data),
+        defer(CreditReport.errors_found),
+        defer(CreditReport.discrepancies)
+    ).filter(
         CreditReport.client_id == current_user.client_id
     ).order_by(CreditReport.upload_date.desc()).all()
     
@@ -479,14 +638,15 @@ def get_client_reports(
 
 @app.get("/api/client/disputes")
 def get_client_disputes(
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Get client's disputes"""
     if not current_user.client_id:
         raise HTTPException(status_code=400, detail="Not a client account")
     
-    disputes = db.query(Dispute).filter(
+    # List view: leave the generated letter bodies unloaded
+    disputes = db.query(Dispute).options(defer(Dispute.letter_content)).filter(
         Dispute.client_id == current_user.client_id
     ).order_by(Dispute.created_date.desc()).all()
     
@@ -503,7 +663,7 @@ def get_subscription_plans(db: Session = Depends(get_db)):
 @app.post("/api/payments/create-checkout")
 def create_checkout(
     data: dict,
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Create Stripe checkout session"""
@@ -540,32 +700,68 @@ def create_checkout(
     
     return {"checkout_url": session["url"]}
 
+def _process_stripe_event(db: Session, event):
+    """Apply a verified Stripe event once; raises so Stripe redelivers on failure"""
+    # The event's row commits together with its changes, so a failed
+    # attempt leaves nothing behind and the redelivery runs it again
+    db.add(StripeWebhookEvent(event_id=event["id"], event_type=event["type"]))
+    try:
+        db.flush()
+    except IntegrityError:
+        # Already handled (or being handled) for an earlier delivery
+        db.rollback()
+        return
+    
+    result = stripe_service.handle_webhook_event(event)
+    
+    if not result["success"]:
+        db.rollback()
+        raise HTTPException(status_code=500, detail="Webhook processing failed")
+    
+    event_type = result.get("event_type")
+    
+    # Update database based on event
+    if event_type == "checkout.session.completed":
+        # Create subscription record
+        pass
+    elif event_type == "invoice.paid":
+        # Create payment record
+        pass
+    
+    db.commit()
+
 @app.post("/api/payments/webhook")
 async def stripe_webhook(request: Request, db: Session = Depends(get_db)):
     """Handle Stripe webhooks"""
-    payload = await request.body()
     signature = request.headers.get("stripe-signature")
+    if not signature:
+        raise HTTPException(status_code=400, detail="Missing Stripe signature")
     
-    result = stripe_service.handle_webhook(payload, signature)
+    # Read the body with a hard cap so oversized posts are cut off early
+    if int(request.headers.get("content-length") or 0) > MAX_WEBHOOK_BODY_BYTES:
+        raise HTTPException(status_code=413, detail="Webhook payload too large")
     
-    if result["success"]:
-        # Process the event
-        event_type = result.get("event_type")
-        event_data = result.get("event", {}).get("data", {}).get("object", {})
-        
-        # Update database based on event
-        if event_type == "checkout.session.completed":
-            # Create subscription record
-            pass
-        elif event_type == "invoice.paid":
-            # Create payment record
-            pass
+    chunks = []
+    received = 0
+    async for chunk in request.stream():
+        received += len(chunk)
+        if received > MAX_WEBHOOK_BODY_BYTES:
+            raise HTTPException(status_code=413, detail="Webhook payload too large")
+        chunks.append(chunk)
+    payload = b"".join(chunks)
+    
+    verified = stripe_service.construct_event(payload, signature)
+    if not verified["success"]:
+        raise HTTPException(status_code=400, detail=verified["error"])
+    
+    # Handled before answering, so a failure returns non-2xx and Stripe retries
+    await to_thread.run_sync(_process_stripe_event, db, verified["event"])
     
     return {"status": "ok"}
 
 @app.get("/api/payments/billing-portal")
 def get_billing_portal(
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Get Stripe billing portal URL"""
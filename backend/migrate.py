@@ -0,0 +1,68 @@
+"""One-off schema upgrades for databases created by older releases
+
+create_all only adds missing tables, so changes to existing ones are applied
+here, once, when deploying a release that needs them:
+
+    python migrate.py
+"""
+from sqlalchemy import Enum, inspect, text
+from database import Base, engine
+from models import Dispute, User
+import logging
+
+logger = logging.getLogger(__name__)
+
+def _column_names(conn, table: str) -> set:
+    """Column names of an existing table"""
+    return {column["name"] for column in inspect(conn).get_columns(table)}
+
+def _add_credit_report_content_hash(conn):
+    """credit_reports.content_hash: SHA-256 used to deduplicate uploads"""
+    if "content_hash" not in _column_names(conn, "credit_reports"):
+        conn.execute(text("ALTER TABLE credit_reports ADD COLUMN content_hash VARCHAR(64)"))
+
+def _convert_status_and_role_to_enums(conn):
+    """disputes.status / users.role: VARCHAR -> native enum types, status NOT NULL"""
+    if conn.dialect.name != "postgresql":
+        # Non-native Enums are plain VARCHARs elsewhere; nothing to convert
+        return
+    
+    for table, column in ((Dispute.__table__, "status"), (User.__table__, "role")):
+        enum_type = table.c[column].type
+        enum_type.create(conn, checkfirst=True)
+        
+        current = {c["name"]: c["type"] for c in inspect(conn).get_columns(table.name)}[column]
+        if isinstance(current, Enum):
+            continue
+        # A value outside the enum fails the cast and rolls the whole upgrade
+        # back, rather than being silently rewritten
+        conn.execute(text(
+            f"ALTER TABLE {table.name} ALTER COLUMN {column} "
+            f"TYPE {enum_type.name} USING {column}::{enum_type.name}"
+        ))
+    
+    # Rows written before status became required get the model default
+    conn.execute(text("UPDATE disputes SET status = 'pending' WHERE status IS NULL"))
+    conn.execute(text("ALTER TABLE disputes ALTER COLUMN status SET NOT NULL"))
+
+# In-place upgrades for tables created by older releases, in order; each step
+# checks the live schema first, so re-running them is a no-op
+_SCHEMA_UPGRADES = (
+    _add_credit_report_content_hash,
+    _convert_status_and_role_to_enums,
+)
+
+def upgrade_schema():
+    """Apply the changes create_all cannot make to tables that already exist"""
+    with engine.begin() as conn:
+        for upgrade in _SCHEMA_UPGRADES:
+            upgrade(conn)
+        # Indexes declared on models after their table was first created
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(conn, checkfirst=True)
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    upgrade_schema()
+    logger.info("Schema upgraded")
\ No newline at end of file
@@ -1,11 +1,13 @@
 from models.client import Client
 from models.credit_report import CreditReport, CreditAccount
-from models.dispute import Dispute, DISPUTE_TYPES
-from models.user import User, AuditLog, Notification
-from models.payment import SubscriptionPlan, Subscription, Payment, OneTimeCharge
+from models.dispute import Dispute, DISPUTE_TYPES, DISPUTE_STATUSES
+from models.user import User, AuditLog, Notification, USER_ROLES
+from models.payment import SubscriptionPlan, Subscription, Payment, OneTimeCharge, StripeWebhookEvent
+from models.scheduler_run import SchedulerRun
 
 __all__ = [
     'Client', 'CreditReport', 'CreditAccount', 'Dispute', 'DISPUTE_TYPES',
-    'User', 'AuditLog', 'Notification', 'SubscriptionPlan', 'Subscription',
-    'Payment', 'OneTimeCharge'
+    'DISPUTE_STATUSES', 'User', 'AuditLog', 'Notification', 'USER_ROLES',
+    'SubscriptionPlan', 'Subscription', 'Payment', 'OneTimeCharge',
+    'StripeWebhookEvent', 'SchedulerRun'
 ]
\ No newline at end of file
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text, JSON, ForeignKey, Float, Boolean
+from sqlalchemy import Column, Integer, String, DateTime, Text, JSON, ForeignKey, Float, Boolean, Index
 from sqlalchemy.orm import relationship
 from database import Base
 from datetime import datetime
@@ -11,6 +11,7 @@ class CreditReport(Base):
     file_path = Column(String(500))
     original_filename = Column(String(255))
     file_size = Column(Integer)
+    content_hash = Column(String(64))  # SHA-256 of the uploaded file
     upload_date = Column(DateTime, default=datetime.utcnow)
     bureau = Column(String(50))
     report_date = Column(DateTime)
@@ -44,13 +45,21 @@ class CreditReport(Base):
     # Relationships
     client = relationship("Client", back_populates="credit_reports")
     accounts = relationship("CreditAccount", back_populates="credit_report", cascade="all, delete-orphan")
+    
+    # Indexes
+    __table_args__ = (
+        # Client report lists and latest-report lookups, newest first
+        Index("ix_credit_reports_client_upload", client_id, upload_date.desc()),
+        # Duplicate upload detection
+        Index("ix_credit_reports_client_hash", client_id, content_hash),
+    )
 
 class CreditAccount(Base):
     __tablename__ = "credit_accounts"
     
     id = Column(Integer, primary_key=True, index=True)
-    report_id = Column(Integer, ForeignKey("credit_reports.id", ondelete="CASCADE"), nullable=False)
-    client_id = Column(Integer, ForeignKey("clients.id", ondelete="CASCADE"))
+    report_id = Column(Integer, ForeignKey("credit_reports.id", ondelete="CASCADE"), nullable=False, index=True)
+    client_id = Column(Integer, ForeignKey("clients.id", ondelete="CASCADE"), index=True)
     
     # Account info
     creditor_name = Column(String(255))
@@ -1,15 +1,17 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text, JSON, ForeignKey, Boolean
+from sqlalchemy import Column, Integer, String, DateTime, Text, JSON, ForeignKey, Boolean, Index, Enum, and_
 from sqlalchemy.orm import relationship
 from database import Base
 from datetime import datetime
 
+DISPUTE_STATUSES = ("pending", "generated", "sent", "response_received", "resolved", "closed")
+
 class Dispute(Base):
     __tablename__ = "disputes"
     
     id = Column(Integer, primary_key=True, index=True)
     client_id = Column(Integer, ForeignKey("clients.id", ondelete="CASCADE"), nullable=False)
-    account_id = Column(Integer, ForeignKey("credit_accounts.id", ondelete="SET NULL"))
-    credit_report_id = Column(Integer, ForeignKey("credit_reports.id", ondelete="SET NULL"))
+    account_id = Column(Integer, ForeignKey("credit_accounts.id", ondelete="SET NULL"), index=True)
+    credit_report_id = Column(Integer, ForeignKey("credit_reports.id", ondelete="SET NULL"), index=True)
     
     # Dispute details
     bureau = Column(String(50), nullable=False)
@@ -34,7 +36,7 @@ class Dispute(Base):
     letter_generated_date = Column(DateTime)
     
     # Status tracking
-    status = Column(String(50), default="pending")  # pending, generated, sent, response_received, resolved, closed
+    status = Column(Enum(*DISPUTE_STATUSES, name="dispute_status"), default="pending", nullable=False)
     created_date = Column(DateTime, default=datetime.utcnow)
     sent_date = Column(DateTime)
     expected_response_date = Column(DateTime)
@@ -55,6 +57,22 @@ class Dispute(Base):
     
     # Relationships
     client = relationship("Client", back_populates="disputes")
+    
+    # Indexes
+    __table_args__ = (
+        # Per-client dispute counts by status (dashboard)
+        Index("ix_disputes_client_status", client_id, status),
+        # Per-client dispute lists, newest first
+        Index("ix_disputes_client_created", client_id, created_date.desc()),
+        # Per-client progress by dispute round
+        Index("ix_disputes_client_round", client_id, round_number),
+        # Scheduler scans for sent disputes still due a follow-up reminder
+        Index("ix_disputes_follow_up_due", sent_date,
+              postgresql_where=and_(status == "sent", follow_up_date.is_(None))),
+        # Scheduler scans for sent disputes still awaiting a bureau response
+        Index("ix_disputes_response_due", sent_date,
+              postgresql_where=and_(status == "sent", response_type.is_(None))),
+    )
 
 DISPUTE_TYPES = {
     "outdated_negative": "Outdated Negative (7+ Years)",
@@ -39,9 +39,9 @@ class Subscription(Base):
     __tablename__ = "subscriptions"
     
     id = Column(Integer, primary_key=True, index=True)
-    client_id = Column(Integer, ForeignKey("clients.id", ondelete="CASCADE"), nullable=False)
-    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
-    plan_id = Column(Integer, ForeignKey("subscription_plans.id"), nullable=False)
+    client_id = Column(Integer, ForeignKey("clients.id", ondelete="CASCADE"), nullable=False, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    plan_id = Column(Integer, ForeignKey("subscription_plans.id"), nullable=False, index=True)
     
     # Stripe
     stripe_customer_id = Column(String(100))
@@ -67,15 +67,16 @@ class Subscription(Base):
     
     # Relationships
     client = relationship("Client", back_populates="subscriptions")
-    plan = relationship("SubscriptionPlan", back_populates="subscriptions")
+    # Nearly always read with the subscription; fold into the same SELECT
+    plan = relationship("SubscriptionPlan", back_populates="subscriptions", lazy="joined", innerjoin=True)
     payments = relationship("Payment", back_populates="subscription")
 
 class Payment(Base):
     __tablename__ = "payments"
     
     id = Column(Integer, primary_key=True, index=True)
-    client_id = Column(Integer, ForeignKey("clients.id", ondelete="CASCADE"), nullable=False)
-    subscription_id = Column(Integer, ForeignKey("subscriptions.id", ondelete="SET NULL"))
+    client_id = Column(Integer, ForeignKey("clients.id", ondelete="CASCADE"), nullable=False, index=True)
+    subscription_id = Column(Integer, ForeignKey("subscriptions.id", ondelete="SET NULL"), index=True)
     
     # Stripe
     stripe_payment_intent_id = Column(String(100), unique=True)
@@ -110,7 +111,7 @@ class OneTimeCharge(Base):
     __tablename__ = "one_time_charges"
     
     id = Column(Integer, primary_key=True, index=True)
-    client_id = Column(Integer, ForeignKey("clients.id", ondelete="CASCADE"), nullable=False)
+    client_id = Column(Integer, ForeignKey("clients.id", ondelete="CASCADE"), nullable=False, index=True)
     
     # Stripe
     stripe_payment_intent_id = Column(String(100))
@@ -122,4 +123,12 @@ class OneTimeCharge(Base):
     
     # Dates
     created_at = Column(DateTime, default=datetime.utcnow)
-    paid_at = Column(DateTime)
\ No newline at end of file
+    paid_at = Column(DateTime)
+
+class StripeWebhookEvent(Base):
+    __tablename__ = "stripe_webhook_events"
+    
+    # Stripe's event id; the primary key lets each delivery be handled once
+    event_id = Column(String(255), primary_key=True)
+    event_type = Column(String(100))
+    processed_at = Column(DateTime, default=datetime.utcnow)
\ No newline at end of file
@@ -0,0 +1,13 @@
+from sqlalchemy import Column, String, DateTime
+from database import Base
+from datetime import datetime
+
+class SchedulerRun(Base):
+    __tablename__ = "scheduler_runs"
+    
+    # e.g. "scheduler:monthly_reports:2024-01-31"; the primary key makes each run claimable once
+    name = Column(String(100), primary_key=True)
+    host = Column(String(255))
+    started_at = Column(DateTime, default=datetime.utcnow)
+    # Still NULL after started_at has gone stale: the run died and may be retaken
+    finished_at = Column(DateTime)
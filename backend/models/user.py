@@ -1,9 +1,11 @@
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey, Text
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey, Text, Index, Enum
 from sqlalchemy.orm import relationship
 from database import Base
 from datetime import datetime
 import secrets
 
+USER_ROLES = ("admin", "staff", "client")
+
 class User(Base):
     __tablename__ = "users"
     
@@ -12,12 +14,12 @@ class User(Base):
     password_hash = Column(String(255), nullable=False)
     
     # Role
-    role = Column(String(20), default="client")  # admin, staff, client
+    role = Column(Enum(*USER_ROLES, name="user_role"), default="client")
     is_active = Column(Boolean, default=True)
     is_verified = Column(Boolean, default=False)
     
     # Profile
-    client_id = Column(Integer, ForeignKey("clients.id", ondelete="SET NULL"), nullable=True)
+    client_id = Column(Integer, ForeignKey("clients.id", ondelete="SET NULL"), nullable=True, index=True)
     first_name = Column(String(100))
     last_name = Column(String(100))
     phone = Column(String(20))
@@ -40,6 +42,13 @@ class User(Base):
     client = relationship("Client", back_populates="user_account")
     notifications = relationship("Notification", back_populates="user", cascade="all, delete-orphan")
     audit_logs = relationship("AuditLog", back_populates="user", cascade="all, delete-orphan")
+    
+    # Indexes
+    __table_args__ = (
+        # Password reset lookups only ever target outstanding tokens
+        Index("ix_users_reset_token_live", reset_token,
+              postgresql_where=reset_token.isnot(None)),
+    )
 
     @property
     def full_name(self):
@@ -64,6 +73,12 @@ class AuditLog(Base):
     
     # Relationship
     user = relationship("User", back_populates="audit_logs")
+    
+    # Indexes
+    __table_args__ = (
+        # A user's activity, most recent first
+        Index("ix_audit_logs_user_timestamp", user_id, timestamp.desc()),
+    )
 
 class Notification(Base):
     __tablename__ = "notifications"
@@ -79,4 +94,13 @@ class Notification(Base):
     read_at = Column(DateTime)
     
     # Relationship
-    user = relationship("User", back_populates="notifications")
\ No newline at end of file
+    user = relationship("User", back_populates="notifications")
+    
+    # Indexes
+    __table_args__ = (
+        # A user's notification feed, newest first
+        Index("ix_notifications_user_created", user_id, created_at.desc()),
+        # Unread lookups only touch the (small) unread subset
+        Index("ix_notifications_user_unread", user_id, created_at.desc(),
+              postgresql_where=is_read == False),
+    )
\ No newline at end of file
@@ -1,48 +1,159 @@
+import os
+
+# Pages are OCR'd concurrently, so keep each Tesseract instance single-threaded.
+# OpenMP reads this once when libgomp loads, so it must be set before the
+# tesserocr import below (the Dockerfile also sets it for the whole process)
+os.environ.setdefault("OMP_THREAD_LIMIT", "1")
+
 from pdf2image import convert_from_path
-import pytesseract
+import tesserocr
 from PIL import Image, ImageEnhance, ImageFilter
 import cv2
 import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from types import MappingProxyType
 from typing import List, Dict, Optional
 import logging
+import re
+import tempfile
+import threading
 
 logger = logging.getLogger(__name__)
 
+# Max pages OCR'd at once; each rasterized page holds several full-size buffers
+OCR_MAX_WORKERS = int(os.getenv("OCR_MAX_WORKERS") or os.cpu_count() or 1)
+
+# Quality probe: sharp, mostly black-on-white pages skip denoising
+CLEAN_PAGE_MIN_SHARPNESS = 100.0
+CLEAN_PAGE_MIN_EXTREME_RATIO = 0.9
+
+# Deskew: probe width in pixels, and the skew range that gets corrected
+DESKEW_PROBE_WIDTH = 1000
+DESKEW_MIN_ANGLE = 0.5
+DESKEW_MAX_ANGLE = 15.0
+
+# Common Tesseract misreads in credit report vocabulary
+_OCR_CORRECTIONS = MappingProxyType({
+    "Equlfax": "Equifax",
+    "Equlfa": "Equifax",
+    "Experlan": "Experian",
+    "TransUnlon": "TransUnion",
+    "TransUnon": "TransUnion",
+    "credlt": "credit",
+    "sc0re": "score",
+    "acc0unt": "account",
+    "b4lance": "balance",
+    "p4yment": "payment",
+    "h1story": "history",
+    "negatlve": "negative",
+    "posltlve": "positive",
+    "1nqu1ry": "inquiry",
+    "c0llectlon": "collection",
+    "charg3-off": "charge-off",
+    "ch4rge-off": "charge-off",
+    "del1nquent": "delinquent",
+    "p4st due": "past due",
+    "curr3nt": "current",
+    "op3ned": "opened",
+    "cl0sed": "closed",
+    "1lm1t": "limit",
+    "h1gh": "high",
+})
+
+# Longest keys first so a shorter key never shadows a longer one
+_CORRECTIONS_RE = re.compile(
+    "|".join(re.escape(wrong) for wrong in sorted(_OCR_CORRECTIONS, key=len, reverse=True))
+)
+
+# Whitespace around line breaks, including blank lines in between
+_LINE_BREAK_RE = re.compile(r"\s*\n\s*")
+
+# Bureau score in one scan; the group name is the bureau and the last three
+# characters of the match are the score
+_SCORE_RE = re.compile(
+    r"(?P<equifax>(?:Equifax|EQ)[\s:]*\d{3})"
+    r"|(?P<experian>(?:Experian|EX)[\s:]*\d{3})"
+    r"|(?P<transunion>(?:TransUnion|TU)[\s:]*\d{3})",
+    re.IGNORECASE
+)
+
 class OCREngine:
     """Advanced OCR engine for extracting text from scanned PDFs and images"""
     
     def __init__(self):
         self.preprocessing_enabled = True
-        self.tesseract_config = r'--oem 3 --psm 6'
+        self.default_dpi = 200
+        # Long-lived OCR workers, each holding its own loaded Tesseract model
+        self._executor = ThreadPoolExecutor(max_workers=OCR_MAX_WORKERS, thread_name_prefix="ocr")
+        self._local = threading.local()
         
-    def process_pdf(self, pdf_path: str, dpi: int = 300) -> str:
+    def process_pdf(self, pdf_path: str, dpi: int = None) -> str:
         """Convert PDF to images and perform OCR"""
+        dpi = dpi or self.default_dpi
         try:
             logger.info(f"Processing PDF with OCR: {pdf_path}")
-            images = convert_from_path(pdf_path, dpi=dpi)
+            with tempfile.TemporaryDirectory() as output_folder:
+                # Rasterize to disk across several pdftoppm processes; pages
+                # are loaded one per worker, not all held in memory at once
+                page_paths = convert_from_path(
+                    pdf_path, dpi=dpi, output_folder=output_folder,
+                    paths_only=True, thread_count=OCR_MAX_WORKERS
+                )
+                
+                # Pages are independent; Tesseract and OpenCV release the GIL,
+                # so threads give real parallelism
+                logger.info(f"Processing {len(page_paths)} pages")
+                
+                page_texts = self._executor.map(self._process_image_file, page_paths)
+                full_text = "".join(
+                    f"\n--- Page {page} ---\n" + text
+                    for page, text in enumerate(page_texts, 1)
+                )
             
-            full_text = ""
-            for i, image in enumerate(images):
-                logger.info(f"Processing page {i+1}/{len(images)}")
-                page_text = self._process_image(image)
-                full_text += f"\n--- Page {i+1} ---\n" + page_text
+            return self._post_process_text(full_text)
             
+        except Exception as e:
+            logger.error(f"PDF OCR error: {str(e)}")
+            return f"OCR Error: {str(e)}"
+    
+    def process_pdf_pages(self, pdf_path: str, pages: List[int], dpi: int = None) -> str:
+        """OCR only the listed (1-based) pages of a PDF"""
+        dpi = dpi or self.default_dpi
+        try:
+            logger.info(f"OCR on {len(pages)} pages: {pdf_path}")
+            
+            ocr_pages = self._executor.map(partial(self._ocr_pdf_page, pdf_path, dpi=dpi), pages)
+            full_text = "".join(
+                f"\n--- Page {page} ---\n" + text
+                for page, text in zip(pages, ocr_pages)
+            )
             return self._post_process_text(full_text)
             
         except Exception as e:
             logger.error(f"PDF OCR error: {str(e)}")
             return f"OCR Error: {str(e)}"
     
+    def _ocr_pdf_page(self, pdf_path: str, page: int, dpi: int) -> str:
+        """Rasterize and OCR a single PDF page"""
+        image = convert_from_path(pdf_path, dpi=dpi, first_page=page, last_page=page)[0]
+        return self._process_image(image)
+    
     def process_image(self, image_path: str) -> str:
         """Process a single image file"""
         try:
             image = Image.open(image_path)
-            text = self._process_image(image)
+            text = self._executor.submit(self._process_image, image).result()
             return self._post_process_text(text)
         except Exception as e:
             logger.error(f"Image OCR error: {str(e)}")
             return f"OCR Error: {str(e)}"
     
+    def _process_image_file(self, image_path: str) -> str:
+        """Load a rasterized page from disk and OCR it"""
+        with Image.open(image_path) as image:
+            return self._process_image(image)
+    
     def _process_image(self, image: Image.Image, strategy: str = "adaptive") -> str:
         """Process image with specified strategy"""
         strategies = {
@@ -56,37 +167,77 @@ class OCREngine:
         preprocessor = strategies.get(strategy, self._preprocess_adaptive)
         processed = preprocessor(image)
         
-        text = pytesseract.image_to_string(processed, config=self.tesseract_config)
-        return text
+        api = self._tesseract_api()
+        api.SetImage(Image.fromarray(processed))
+        return api.GetUTF8Text()
+    
+    def _tesseract_api(self) -> tesserocr.PyTessBaseAPI:
+        """Per-thread Tesseract handle; the model loads once per worker"""
+        api = getattr(self._local, "api", None)
+        if api is None:
+            # Same settings as the former "--oem 3 --psm 6" CLI config
+            api = tesserocr.PyTessBaseAPI(psm=tesserocr.PSM.SINGLE_BLOCK, oem=tesserocr.OEM.DEFAULT)
+            self._local.api = api
+        return api
     
     def _preprocess_standard(self, image: Image.Image) -> np.ndarray:
         """Standard preprocessing"""
-        img_array = np.array(image)
-        gray = cv2.cvtColor(img_array, cv2.COLOR_RGB2GRAY) if len(img_array.shape) == 3 else img_array
-        _, binary = cv2.threshold(gray, 150, 255, cv2.THRESH_BINARY)
-        return binary
+        # Grayscale in PIL and threshold in place: one page-sized buffer
+        # instead of RGB, gray and binary copies
+        gray = np.array(image.convert("L"))
+        cv2.threshold(gray, 150, 255, cv2.THRESH_BINARY, dst=gray)
+        return gray
     
     def _preprocess_aggressive(self, image: Image.Image) -> np.ndarray:
         """Aggressive preprocessing for poor quality scans"""
-        img_array = np.array(image)
-        gray = cv2.cvtColor(img_array, cv2.COLOR_RGB2GRAY) if len(img_array.shape) == 3 else img_array
-        denoised = cv2.fastNlMeansDenoising(gray, None, 30, 7, 21)
+        gray = self._to_gray(image)
+        denoised = cv2.fastNlMeansDenoising(gray, self._scratch("denoised", gray.shape), 30, 7, 21)
         clahe = cv2.createCLAHE(clipLimit=3.0, tileGridSize=(8,8))
-        enhanced = clahe.apply(denoised)
-        _, binary = cv2.threshold(enhanced, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
-        return binary
+        enhanced = clahe.apply(denoised, self._scratch("binary", gray.shape))
+        cv2.threshold(enhanced, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU, dst=enhanced)
+        return enhanced
     
     def _preprocess_adaptive(self, image: Image.Image) -> np.ndarray:
         """Adaptive thresholding preprocessing"""
-        img_array = np.array(image)
-        gray = cv2.cvtColor(img_array, cv2.COLOR_RGB2GRAY) if len(img_array.shape) == 3 else img_array
-        denoised = cv2.fastNlMeansDenoising(gray, None, 10, 7, 21)
+        gray = self._to_gray(image)
+        
+        # Clean digital renders go to Tesseract as-is; its own Otsu
+        # binarization is all they need
+        if self._is_clean_page(gray):
+            return gray
+        
+        denoised = cv2.fastNlMeansDenoising(gray, self._scratch("denoised", gray.shape), 10, 7, 21)
         binary = cv2.adaptiveThreshold(
             denoised, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
-            cv2.THRESH_BINARY, 11, 2
+            cv2.THRESH_BINARY, 11, 2, dst=self._scratch("binary", gray.shape)
         )
         return binary
     
+    def _to_gray(self, image: Image.Image) -> np.ndarray:
+        """Grayscale page in this worker's reusable buffer"""
+        img_array = np.asarray(image)
+        if img_array.ndim != 3:
+            return img_array
+        return cv2.cvtColor(img_array, cv2.COLOR_RGB2GRAY, dst=self._scratch("gray", img_array.shape[:2]))
+    
+    def _scratch(self, name: str, shape: tuple) -> np.ndarray:
+        """Per-thread page buffer, reused until the page size changes"""
+        buffers = getattr(self._local, "buffers", None)
+        if buffers is None:
+            buffers = self._local.buffers = {}
+        buffer = buffers.get(name)
+        if buffer is None or buffer.shape != shape:
+            buffer = buffers[name] = np.empty(shape, np.uint8)
+        return buffer
+    
+    def _is_clean_page(self, gray: np.ndarray) -> bool:
+        """Cheap sharpness and contrast probe on a downsampled copy"""
+        sample = gray[::4, ::4]
+        if cv2.Laplacian(sample, cv2.CV_64F).var() < CLEAN_PAGE_MIN_SHARPNESS:
+            return False
+        extremes = np.count_nonzero((sample < 64) | (sample > 192))
+        return extremes >= CLEAN_PAGE_MIN_EXTREME_RATIO * sample.size
+    
     def _preprocess_morphological(self, image: Image.Image) -> np.ndarray:
         """Morphological preprocessing for faded text"""
         img_array = np.array(image)
@@ -98,73 +249,44 @@ class OCREngine:
     
     def _preprocess_deskew(self, image: Image.Image) -> np.ndarray:
         """Deskew preprocessing for rotated documents"""
-        img_array = np.array(image)
-        gray = cv2.cvtColor(img_array, cv2.COLOR_RGB2GRAY) if len(img_array.shape) == 3 else img_array
-        
-        # Detect skew angle
-        coords = np.column_stack(np.where(gray > 0))
-        angle = cv2.minAreaRect(coords)[-1]
+        gray = self._to_gray(image)
         
-        if angle < -45:
-            angle = -(90 + angle)
-        else:
-            angle = -angle
-        
-        # Rotate
-        (h, w) = gray.shape[:2]
-        center = (w // 2, h // 2)
-        M = cv2.getRotationMatrix2D(center, angle, 1.0)
-        rotated = cv2.warpAffine(gray, M, (w, h),
+        # Rotate only when the page is measurably skewed
+        angle = self._skew_angle(gray)
+        if abs(angle) >= DESKEW_MIN_ANGLE:
+            (h, w) = gray.shape[:2]
+            center = (w // 2, h // 2)
+            M = cv2.getRotationMatrix2D(center, angle, 1.0)
+            gray = cv2.warpAffine(gray, M, (w, h),
                                   flags=cv2.INTER_CUBIC,
                                   borderMode=cv2.BORDER_REPLICATE)
         
-        _, binary = cv2.threshold(rotated, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+        _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
         return binary
     
+    def _skew_angle(self, gray: np.ndarray) -> float:
+        """Median text-line angle from Hough segments on a downsampled page"""
+        scale = min(1.0, DESKEW_PROBE_WIDTH / gray.shape[1])
+        small = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA) if scale < 1.0 else gray
+        edges = cv2.Canny(small, 50, 150)
+        lines = cv2.HoughLinesP(edges, 1, np.pi / 360, 100, minLineLength=100, maxLineGap=10)
+        if lines is None:
+            return 0.0
+        
+        x1, y1, x2, y2 = lines.reshape(-1, 4).astype(np.float64).T
+        angles = (np.degrees(np.arctan2(y2 - y1, x2 - x1)) + 90.0) % 180.0 - 90.0
+        angles = angles[np.abs(angles) <= DESKEW_MAX_ANGLE]
+        return float(np.median(angles)) if angles.size else 0.0
+    
     def _post_process_text(self, text: str) -> str:
         """Post-process OCR text with corrections"""
-        corrections = {
-            "Equlfax": "Equifax",
-            "Equlfa": "Equifax",
-            "Experlan": "Experian",
-            "Experian": "Experian",
-            "TransUnlon": "TransUnion",
-            "TransUnon": "TransUnion",
-            "credlt": "credit",
-            "sc0re": "score",
-            "acc0unt": "account",
-            "b4lance": "balance",
-            "p4yment": "payment",
-            "h1story": "history",
-            "negatlve": "negative",
-            "posltlve": "positive",
-            "inquiry": "inquiry",
-            "1nqu1ry": "inquiry",
-            "judgment": "judgment",
-            "bankruptcy": "bankruptcy",
-            "c0llectlon": "collection",
-            "charg3-off": "charge-off",
-            "ch4rge-off": "charge-off",
-            "del1nquent": "delinquent",
-            "p4st due": "past due",
-            "curr3nt": "current",
-            "op3ned": "opened",
-            "cl0sed": "closed",
-            "1lm1t": "limit",
-            "h1gh": "high",
-        }
-        
-        for wrong, correct in corrections.items():
-            text = text.replace(wrong, correct)
+        text = _CORRECTIONS_RE.sub(lambda m: _OCR_CORRECTIONS[m.group(0)], text)
         
         # Clean up whitespace
-        lines = [line.strip() for line in text.split('\n') if line.strip()]
-        return '\n'.join(lines)
+        return _LINE_BREAK_RE.sub("\n", text).strip()
     
     def extract_credit_report_data(self, text: str) -> Dict:
         """Extract structured data from OCR text"""
-        import re
-        
         data = {
             "raw_ocr_text": text,
             "pages_processed": text.count("--- Page"),
@@ -172,17 +294,11 @@ class OCREngine:
             "extracted_scores": {}
         }
         
-        # Try to extract scores
-        score_patterns = [
-            r"(?:Equifax|EQ)[\s:]*(\d{3})",
-            r"(?:Experian|EX)[\s:]*(\d{3})",
-            r"(?:TransUnion|TU)[\s:]*(\d{3})"
-        ]
-        
-        for pattern in score_patterns:
-            match = re.search(pattern, text, re.IGNORECASE)
-            if match:
-                bureau = "equifax" if "Equifax" in pattern else "experian" if "Experian" in pattern else "transunion"
-                data["extracted_scores"][bureau] = int(match.group(1))
+        # Try to extract scores; keep the first hit per bureau
+        scores = data["extracted_scores"]
+        for match in _SCORE_RE.finditer(text):
+            scores.setdefault(match.lastgroup, int(match.group()[-3:]))
+            if len(scores) == 3:
+                break
         
         return data
\ No newline at end of file
@@ -1,10 +1,16 @@
 from parsers.pdf_parser import PDFParser
 from parsers.ocr_engine import OCREngine
-from typing import Dict, Any
+from typing import Dict, Any, List
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Pages with less extracted text than this are OCR'd
+MIN_PAGE_TEXT_CHARS = 50
+
+# Resolution for a second OCR pass when the default pass reads nothing
+OCR_RETRY_DPI = 300
+
 class OCRIntegration:
     """Integration layer for PDF and OCR processing"""
     
@@ -30,24 +36,30 @@ class OCRIntegration:
             # First try direct PDF text extraction
             logger.info("Attempting direct PDF text extraction...")
             pdf_data = self.pdf_parser.parse_report(file_path, bureau)
+            page_texts = pdf_data.pop("page_texts", None) or []
             
-            # Check if we got good data
-            has_meaningful_data = (
-                pdf_data.get("personal_info") or
-                any(pdf_data.get("scores", {}).values()) or
-                len(pdf_data.get("accounts", [])) > 0
-            )
+            # Decided per page: a digital cover page must not hide scanned
+            # tradeline pages behind it
+            ocr_pages = [page for page, text in enumerate(page_texts, 1)
+                         if len(text.strip()) < MIN_PAGE_TEXT_CHARS]
             
-            if has_meaningful_data and "error" not in pdf_data:
+            # Any page with a real text layer keeps the direct parse; OCR only
+            # fills in the pages without one
+            if len(ocr_pages) < len(page_texts) and "error" not in pdf_data:
+                if ocr_pages:
+                    self._merge_ocr_pages(pdf_data, file_path, ocr_pages)
                 logger.info("Direct PDF extraction successful")
                 result["success"] = True
                 result["data"] = pdf_data
                 result["method_used"] = "pdf_parser"
                 return result
             
-            # If direct extraction fails or returns minimal data, try OCR
+            # If direct extraction fails or no page has text, OCR the whole document
             logger.info("Direct extraction insufficient, trying OCR...")
             ocr_text = self.ocr_engine.process_pdf(file_path)
+            if not ocr_text.startswith("OCR Error") and not self._has_page_text(ocr_text):
+                logger.info(f"No text at default DPI, retrying OCR at {OCR_RETRY_DPI}")
+                ocr_text = self.ocr_engine.process_pdf(file_path, dpi=OCR_RETRY_DPI)
             
             if not ocr_text.startswith("OCR Error"):
                 # Parse OCR text
@@ -58,11 +70,7 @@ class OCRIntegration:
                 records = self.pdf_parser._extract_public_records(ocr_text)
                 
                 # Extract scores from OCR
-                scores = {
-                    "equifax": self.pdf_parser._extract_score(ocr_text, "equifax"),
-                    "experian": self.pdf_parser._extract_score(ocr_text, "experian"),
-                    "transunion": self.pdf_parser._extract_score(ocr_text, "transunion")
-                }
+                scores = self.pdf_parser.extract_all_scores(ocr_text)
                 
                 result["success"] = True
                 result["data"] = {
@@ -88,6 +96,22 @@ class OCRIntegration:
         
         return result
     
+    def _merge_ocr_pages(self, pdf_data: Dict[str, Any], file_path: str, pages: List[int]):
+        """Add the OCR'd text and accounts of image-only pages to a direct parse"""
+        # No high-DPI retry here: blank pages are the usual reason these read nothing
+        ocr_text = self.ocr_engine.process_pdf_pages(file_path, pages)
+        if ocr_text.startswith("OCR Error"):
+            logger.warning(f"Keeping the direct parse without pages {pages}: {ocr_text}")
+            return
+        
+        pdf_data["accounts"].extend(self.pdf_parser._extract_accounts(ocr_text, []))
+        pdf_data["raw_text"] = (pdf_data["raw_text"] + ocr_text)[:50000]
+        pdf_data["ocr_pages"] = pages
+    
+    def _has_page_text(self, ocr_text: str) -> bool:
+        """Check whether OCR produced anything besides page markers"""
+        return any(not line.startswith("--- Page") for line in ocr_text.split("\n") if line)
+    
     def process_upload(self, file_path: str, file_type: str = None) -> Dict[str, Any]:
         """Handle uploaded file processing"""
         if file_type and file_type.startswith('image/'):
@@ -106,11 +130,7 @@ class OCRIntegration:
                     "raw_text": ocr_text,
                     "personal_info": personal_info,
                     "accounts": accounts,
-                    "scores": {
-                        "equifax": self.pdf_parser._extract_score(ocr_text, "equifax"),
-                        "experian": self.pdf_parser._extract_score(ocr_text, "experian"),
-                        "transunion": self.pdf_parser._extract_score(ocr_text, "transunion")
-                    }
+                    "scores": self.pdf_parser.extract_all_scores(ocr_text)
                 }
             }
         else:
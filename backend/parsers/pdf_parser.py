@@ -1,11 +1,123 @@
 import pdfplumber
+import pypdfium2 as pdfium
+import pypdfium2.raw as pdfium_c
 import re
+import re2
 from datetime import datetime
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Sequence
+from collections import deque, namedtuple
+from concurrent.futures import Future, ProcessPoolExecutor
+from functools import lru_cache
+from types import MappingProxyType
 import logging
+import multiprocessing
+import os
+import threading
 
 logger = logging.getLogger(__name__)
 
+_CREDIT_SCORE_RE = re.compile(r"credit\s*score[:\s]*(\d{3})", re.IGNORECASE | re.DOTALL)
+
+# Bureau-independent patterns tried after the leading one
+_FALLBACK_SCORE_RES = tuple(
+    re.compile(pattern, re.IGNORECASE | re.DOTALL) for pattern in (
+        r"score[:\s]*(\d{3})",
+        r"(\d{3})\s*(?:credit\s*)?score",
+        r"fico\s*score[:\s]*(\d{3})",
+        r"vantage\s*score[:\s]*(\d{3})",
+    )
+)
+
+_NAME_RE = re.compile(r"(?:name|consumer)[:\s]+([A-Za-z\s]+)", re.IGNORECASE)
+_ADDRESS_RE = re.compile(r"(?:current\s*)?address[:\s]+([^\n]+(?:\n[^\n]+)?)", re.IGNORECASE)
+_SSN_RE = re.compile(r"(?:ssn|social)[:\s]+(\d{3}-?\d{2}-?\d{4}|XXX-XX-(\d{4}))", re.IGNORECASE)
+_DOB_RE = re.compile(r"(?:dob|date\s*of\s*birth)[:\s]+(\d{1,2}[/-]\d{1,2}[/-]\d{2,4})", re.IGNORECASE)
+
+# Python's Unicode \s set spelled out for RE2, whose \s is ASCII-only
+_RE2_SPACE = r"\t-\r\x{1c}-\x{20}\x{85}\x{a0}\x{1680}\x{2000}-\x{200a}\x{2028}\x{2029}\x{202f}\x{205f}\x{3000}"
+
+# Creditor, account number, type and balance. The creditor class overlaps
+# the separator, which backtracks quadratically under Python's re on long
+# letter-only text, so this one runs on RE2's linear-time engine
+_ACCOUNT_BLOCK_RE = re2.compile(
+    rf"([A-Z][A-Za-z{_RE2_SPACE}&.,]+)[{_RE2_SPACE}]+([X\p{{Nd}}-]+)[{_RE2_SPACE}]+"
+    rf"([A-Za-z]+)[{_RE2_SPACE}]+([\p{{Nd}},]+\.?\p{{Nd}}*)"
+)
+
+_HARD_INQUIRY_RE = re.compile(r"(?:hard\s*)?inquiries?[\s:]*([^\n]*(?:\n(?![A-Z]{2,})[^\n]*)*)", re.IGNORECASE)
+_CREDITOR_DATE_RE = re.compile(r"([A-Z][A-Za-z\s]+)\s+(\d{1,2}[/-]\d{1,2}[/-]\d{2,4})")
+
+_PUBLIC_RECORD_RES = MappingProxyType({
+    "bankruptcy": re.compile(r"(?:chapter\s*(7|11|13)|bankruptcy)\s*[\s:]*([^\n]+)", re.IGNORECASE),
+    "judgment": re.compile(r"(?:civil\s*)?judgment[\s:]*([^\n]+)", re.IGNORECASE),
+    "tax_lien": re.compile(r"tax\s*lien[\s:]*([^\n]+)", re.IGNORECASE),
+})
+
+# How each report layout is labelled: its format name, its bureau (None
+# means detected from the text) and the one bureau to score (None scores all)
+_ReportLayout = namedtuple("_ReportLayout", "format bureau score_bureau")
+
+_REPORT_LAYOUTS = MappingProxyType({
+    "SmartCredit": _ReportLayout("SmartCredit", None, None),
+    "IdentityIQ": _ReportLayout("IdentityIQ", None, None),
+    "equifax": _ReportLayout("Equifax", "equifax", "equifax"),
+    "experian": _ReportLayout("Experian", "experian", "experian"),
+    "transunion": _ReportLayout("TransUnion", "transunion", "transunion"),
+    "generic": _ReportLayout("Unknown", "unknown", None),
+})
+
+# Table detection needs ruling lines; pages without vector paths have none
+_PATH_OBJECTS = (pdfium_c.FPDF_PAGEOBJ_PATH,)
+
+# Table extraction is pure-Python pdfminer work, so long reports fan it out
+# to worker processes in runs of pages; shorter ones stay in-process
+PDF_PARSE_WORKERS = int(os.getenv("PDF_PARSE_WORKERS") or os.cpu_count() or 1)
+TABLE_PAGES_PER_TASK = 10
+
+# Shared by every parser; started on first use, stopped by shutdown_table_pool
+_table_pool = None
+_table_pool_lock = threading.Lock()
+
+def _get_table_pool() -> Optional[ProcessPoolExecutor]:
+    """Shared table-extraction pool, or None when parsing stays in-process"""
+    global _table_pool
+    if PDF_PARSE_WORKERS <= 1:
+        return None
+    with _table_pool_lock:
+        if _table_pool is None:
+            # Spawned rather than forked: parsing runs inside a threaded server
+            _table_pool = ProcessPoolExecutor(
+                max_workers=PDF_PARSE_WORKERS,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return _table_pool
+
+def shutdown_table_pool():
+    """Stop the shared table-extraction pool, if it was started"""
+    global _table_pool
+    with _table_pool_lock:
+        pool, _table_pool = _table_pool, None
+    if pool is not None:
+        pool.shutdown()
+
+def _extract_page_tables(file_path: str, page_indices: Sequence[int]) -> List[List]:
+    """Tables for each listed page, in order"""
+    tables = []
+    with pdfplumber.open(file_path) as pdf:
+        for index in page_indices:
+            page = pdf.pages[index]
+            tables.append(page.extract_tables())
+            # Keep only one page's character objects alive at a time
+            page.flush_cache()
+    return tables
+
+@lru_cache(maxsize=None)
+def _bureau_score_re(bureau: str):
+    """Compiled leading score pattern for a bureau"""
+    # Under Python's re a miss rescans the rest of the text from every
+    # bureau mention; RE2 keeps it to one linear pass
+    return re2.compile(rf"(?is){bureau}.*?score[:{_RE2_SPACE}]*(\p{{Nd}}{{3}})")
+
 class PDFParser:
     """Parse credit report PDFs from all three bureaus and formats"""
     
@@ -15,43 +127,131 @@ class PDFParser:
     def parse_report(self, file_path: str, bureau: str = None) -> Dict[str, Any]:
         """Parse a credit report PDF and extract structured data"""
         try:
-            full_text = ""
             tables = []
+            page_texts = []
+            
+            for text, page_tables in self._iter_pages(file_path):
+                page_texts.append(text)
+                # Extract tables for account data
+                tables.extend(page_tables)
             
-            with pdfplumber.open(file_path) as pdf:
-                for i, page in enumerate(pdf.pages):
-                    text = page.extract_text()
-                    if text:
-                        full_text += text + "\n"
-                    # Extract tables for account data
-                    page_tables = page.extract_tables()
-                    tables.extend(page_tables)
+            full_text = "".join(text + "\n" for text in page_texts if text)
             
-            # Detect bureau and format
-            detected_bureau = bureau or self._detect_bureau(full_text)
-            report_format = self._detect_format(full_text)
+            # Detect bureau and format from one lowercased copy
+            text_lower = full_text.lower()
+            text_bureau = self._detect_bureau(full_text, text_lower)
+            detected_bureau = bureau or text_bureau
+            report_format = self._detect_format(full_text, text_lower)
             
             # Parse based on format
-            if report_format == "SmartCredit":
-                return self._parse_smartcredit(full_text, tables, file_path)
-            elif report_format == "IdentityIQ":
-                return self._parse_identityiq(full_text, tables, file_path)
-            elif detected_bureau == "equifax":
-                return self._parse_equifax(full_text, tables, file_path)
-            elif detected_bureau == "experian":
-                return self._parse_experian(full_text, tables, file_path)
-            elif detected_bureau == "transunion":
-                return self._parse_transunion(full_text, tables, file_path)
+            if report_format in ("SmartCredit", "IdentityIQ"):
+                layout = _REPORT_LAYOUTS[report_format]
+            elif detected_bureau in ("equifax", "experian", "transunion"):
+                layout = _REPORT_LAYOUTS[detected_bureau]
             else:
-                return self._parse_generic(full_text, tables, file_path)
+                layout = _REPORT_LAYOUTS["generic"]
+            result = self._build_result(layout, full_text, tables, file_path, text_bureau)
+            
+            # Per-page text layer, so OCR can be limited to image-only pages
+            result["page_texts"] = page_texts
+            return result
                     
         except Exception as e:
             logger.error(f"PDF parsing error: {str(e)}")
             return {"error": str(e), "file_path": file_path}
     
-    def _detect_bureau(self, text: str) -> str:
+    def _iter_pages(self, file_path: str):
+        """Yield (text, tables) per page, using PDFium for text and pdfplumber only for tables"""
+        pool = _get_table_pool()
+        pdf = pdfium.PdfDocument(file_path)
+        try:
+            if pool is None:
+                yield from self._iter_pages_inline(file_path, pdf)
+            else:
+                yield from self._iter_pages_pooled(file_path, pdf, pool)
+        finally:
+            pdf.close()
+    
+    def _iter_page_text(self, pdf):
+        """Yield (index, text, has_paths) for each page of an open PDFium document"""
+        for index in range(len(pdf)):
+            page = pdf[index]
+            textpage = page.get_textpage()
+            text = textpage.get_text_range().replace("\r\n", "\n")
+            # pdfplumber rebuilds the whole character tree before it can look
+            # for tables, so it only sees pages that could hold one
+            has_paths = next(page.get_objects(filter=_PATH_OBJECTS), None) is not None
+            textpage.close()
+            page.close()
+            yield index, text, has_paths
+    
+    def _iter_pages_inline(self, file_path: str, pdf):
+        """Yield (text, tables) per page, extracting tables in this process"""
+        plumber = None
+        try:
+            for index, text, has_paths in self._iter_page_text(pdf):
+                page_tables = []
+                if has_paths:
+                    if plumber is None:
+                        plumber = pdfplumber.open(file_path)
+                    plumber_page = plumber.pages[index]
+                    page_tables = plumber_page.extract_tables()
+                    plumber_page.flush_cache()
+                yield text, page_tables
+        finally:
+            if plumber is not None:
+                plumber.close()
+    
+    def _iter_pages_pooled(self, file_path: str, pdf, pool: ProcessPoolExecutor):
+        """Yield (text, tables) per page, sending runs of table pages to the pool
+        
+        A page is held back only until the run holding it comes back. Reports
+        with fewer than two runs of table pages are extracted in-process.
+        """
+        pending = deque()  # (text, run number or None, position in run)
+        runs = []  # table page indices, TABLE_PAGES_PER_TASK per run
+        results = {}  # run number -> pool future, or tables extracted here
+        
+        def ready(entry):
+            result = results.get(entry[1])
+            return entry[1] is None or (result is not None and result.done())
+        
+        def page(entry):
+            text, number, slot = entry
+            if number is None:
+                return text, []
+            result = results[number]
+            return text, (result.result() if isinstance(result, Future) else result)[slot]
+        
+        for index, text, has_paths in self._iter_page_text(pdf):
+            if not has_paths:
+                pending.append((text, None, 0))
+            else:
+                if not runs or len(runs[-1]) == TABLE_PAGES_PER_TASK:
+                    runs.append([])
+                runs[-1].append(index)
+                pending.append((text, len(runs) - 1, len(runs[-1]) - 1))
+                # From the second full run on, every full run goes to the pool
+                if len(runs) >= 2 and len(runs[-1]) == TABLE_PAGES_PER_TASK:
+                    for number in range(len(results), len(runs)):
+                        results[number] = pool.submit(_extract_page_tables, file_path, runs[number])
+            while pending and ready(pending[0]):
+                yield page(pending.popleft())
+        
+        if results:
+            for number in range(len(results), len(runs)):
+                results[number] = pool.submit(_extract_page_tables, file_path, runs[number])
+        elif runs:
+            # Too few table pages to be worth the pool
+            tables = iter(_extract_page_tables(file_path, [index for run in runs for index in run]))
+            for number, run in enumerate(runs):
+                results[number] = [next(tables) for _ in run]
+        while pending:
+            yield page(pending.popleft())
+    
+    def _detect_bureau(self, text: str, text_lower: str = None) -> str:
         """Detect which bureau the report is from"""
-        text_lower = text.lower()
+        text_lower = text_lower or text.lower()
         scores = {
             "equifax": text_lower.count("equifax"),
             "experian": text_lower.count("experian"),
@@ -60,9 +260,9 @@ class PDFParser:
         max_bureau = max(scores, key=scores.get)
         return max_bureau if scores[max_bureau] > 0 else "unknown"
     
-    def _detect_format(self, text: str) -> str:
+    def _detect_format(self, text: str, text_lower: str = None) -> str:
         """Detect the credit report format"""
-        text_lower = text.lower()
+        text_lower = text_lower or text.lower()
         if "smartcredit" in text_lower or "smart credit" in text_lower:
             return "SmartCredit"
         elif "identityiq" in text_lower or "identity iq" in text_lower:
@@ -75,15 +275,28 @@ class PDFParser:
     
     def _extract_score(self, text: str, bureau: str = None) -> Optional[int]:
         """Extract credit score from text"""
-        patterns = [
-            rf"{bureau}.*?score[:\s]*(\d{{3}})" if bureau else r"credit\s*score[:\s]*(\d{3})",
-            r"score[:\s]*(\d{3})",
-            r"(\d{3})\s*(?:credit\s*)?score",
-            r"fico\s*score[:\s]*(\d{3})",
-            r"vantage\s*score[:\s]*(\d{3})",
-        ]
+        lead = _bureau_score_re(bureau) if bureau else _CREDIT_SCORE_RE
+        return self._first_score(text, (lead,) + _FALLBACK_SCORE_RES)
+    
+    def extract_all_scores(self, text: str) -> Dict[str, Optional[int]]:
+        """Extract all three bureau scores, running the shared fallbacks once"""
+        scores = {}
+        fallback = None
+        fallback_done = False
+        for bureau in ("equifax", "experian", "transunion"):
+            score = self._first_score(text, (_bureau_score_re(bureau),))
+            if score is None:
+                if not fallback_done:
+                    fallback = self._first_score(text, _FALLBACK_SCORE_RES)
+                    fallback_done = True
+                score = fallback
+            scores[bureau] = score
+        return scores
+    
+    def _first_score(self, text: str, patterns) -> Optional[int]:
+        """First in-range score from the first pattern that matches"""
         for pattern in patterns:
-            match = re.search(pattern, text, re.IGNORECASE | re.DOTALL)
+            match = pattern.search(text)
             if match:
                 score = int(match.group(1))
                 if 300 <= score <= 850:
@@ -95,17 +308,17 @@ class PDFParser:
         info = {}
         
         # Name
-        name_match = re.search(r"(?:name|consumer)[:\s]+([A-Za-z\s]+)", text, re.IGNORECASE)
+        name_match = _NAME_RE.search(text)
         if name_match:
             info["name"] = name_match.group(1).strip()
         
         # Address
-        address_match = re.search(r"(?:current\s*)?address[:\s]+([^\n]+(?:\n[^\n]+)?)", text, re.IGNORECASE)
+        address_match = _ADDRESS_RE.search(text)
         if address_match:
             info["address"] = address_match.group(1).strip()
         
         # SSN
-        ssn_match = re.search(r"(?:ssn|social)[:\s]+(\d{3}-?\d{2}-?\d{4}|XXX-XX-(\d{4}))", text, re.IGNORECASE)
+        ssn_match = _SSN_RE.search(text)
         if ssn_match:
             ssn = ssn_match.group(1)
             if "X" in ssn:
@@ -114,7 +327,7 @@ class PDFParser:
                 info["ssn_last_four"] = ssn[-4:]
         
         # DOB
-        dob_match = re.search(r"(?:dob|date\s*of\s*birth)[:\s]+(\d{1,2}[/-]\d{1,2}[/-]\d{2,4})", text, re.IGNORECASE)
+        dob_match = _DOB_RE.search(text)
         if dob_match:
             info["date_of_birth"] = dob_match.group(1)
         
@@ -124,13 +337,6 @@ class PDFParser:
         """Extract account information from report"""
         accounts = []
         
-        # Look for account sections
-        account_patterns = [
-            r"(?:revolving|installment|mortgage|open|closed)\s*accounts",
-            r"(?:creditor|account)\s*name",
-            r"tradelines"
-        ]
-        
         # Try to extract from tables first
         for table in tables:
             if table and len(table) > 1:
@@ -149,10 +355,7 @@ class PDFParser:
         # Extract from text if tables didn't work
         if not accounts:
             # Find account blocks
-            account_blocks = re.findall(
-                r"([A-Z][A-Za-z\s&.,]+)\s+([X\d-]+)\s+([A-Za-z]+)\s+([\d,]+\.?\d*)",
-                text
-            )
+            account_blocks = _ACCOUNT_BLOCK_RE.findall(text)
             for block in account_blocks:
                 accounts.append({
                     "creditor_name": block[0].strip(),
@@ -169,11 +372,10 @@ class PDFParser:
         inquiries = []
         
         # Hard inquiries
-        hard_pattern = r"(?:hard\s*)?inquiries?[\s:]*([^\n]*(?:\n(?![A-Z]{2,})[^\n]*)*)"
-        hard_match = re.search(hard_pattern, text, re.IGNORECASE)
+        hard_match = _HARD_INQUIRY_RE.search(text)
         if hard_match:
             inquiry_text = hard_match.group(1)
-            creditor_matches = re.findall(r"([A-Z][A-Za-z\s]+)\s+(\d{1,2}[/-]\d{1,2}[/-]\d{2,4})", inquiry_text)
+            creditor_matches = _CREDITOR_DATE_RE.findall(inquiry_text)
             for match in creditor_matches:
                 inquiries.append({
                     "creditor_name": match[0].strip(),
@@ -187,14 +389,8 @@ class PDFParser:
         """Extract public records (bankruptcy, judgments, tax liens)"""
         records = []
         
-        patterns = {
-            "bankruptcy": r"(?:chapter\s*(7|11|13)|bankruptcy)\s*[\s:]*([^\n]+)",
-            "judgment": r"(?:civil\s*)?judgment[\s:]*([^\n]+)",
-            "tax_lien": r"tax\s*lien[\s:]*([^\n]+)"
-        }
-        
-        for record_type, pattern in patterns.items():
-            matches = re.findall(pattern, text, re.IGNORECASE)
+        for record_type, pattern in _PUBLIC_RECORD_RES.items():
+            matches = pattern.findall(text)
             for match in matches:
                 records.append({
                     "type": record_type,
@@ -217,109 +413,28 @@ class PDFParser:
         """Parse amount string to float"""
         if not amount_str:
             return 0.0
+        # float() already ignores surrounding whitespace
         try:
-            return float(str(amount_str).replace(",", "").replace("$", "").strip())
-        except:
+            return float(str(amount_str).replace(",", "").replace("$", ""))
+        except ValueError:
             return 0.0
     
-    def _parse_smartcredit(self, text: str, tables: List, file_path: str) -> Dict:
-        """Parse SmartCredit report format"""
+    def _build_result(self, layout: _ReportLayout, text: str, tables: List,
+                      file_path: str, text_bureau: str = None) -> Dict:
+        """Extract every section of a report into the result for its layout"""
+        if layout.score_bureau:
+            scores = {layout.score_bureau: self._extract_score(text, layout.score_bureau)}
+        else:
+            scores = self.extract_all_scores(text)
         return {
-            "format": "SmartCredit",
-            "bureau": self._detect_bureau(text),
+            "format": layout.format,
+            "bureau": layout.bureau or text_bureau or self._detect_bureau(text),
             "personal_info": self._extract_personal_info(text),
-            "scores": {
-                "equifax": self._extract_score(text, "equifax"),
-                "experian": self._extract_score(text, "experian"),
-                "transunion": self._extract_score(text, "transunion")
-            },
+            "scores": scores,
             "accounts": self._extract_accounts(text, tables),
             "inquiries": self._extract_inquiries(text),
             "public_records": self._extract_public_records(text),
             "raw_text": text[:50000],  # Limit raw text size
             "file_path": file_path,
             "parsed_at": datetime.utcnow().isoformat()
-        }
-    
-    def _parse_identityiq(self, text: str, tables: List, file_path: str) -> Dict:
-        """Parse IdentityIQ report format"""
-        return {
-            "format": "IdentityIQ",
-            "bureau": self._detect_bureau(text),
-            "personal_info": self._extract_personal_info(text),
-            "scores": {
-                "equifax": self._extract_score(text, "equifax"),
-                "experian": self._extract_score(text, "experian"),
-                "transunion": self._extract_score(text, "transunion")
-            },
-            "accounts": self._extract_accounts(text, tables),
-            "inquiries": self._extract_inquiries(text),
-            "public_records": self._extract_public_records(text),
-            "raw_text": text[:50000],
-            "file_path": file_path,
-            "parsed_at": datetime.utcnow().isoformat()
-        }
-    
-    def _parse_equifax(self, text: str, tables: List, file_path: str) -> Dict:
-        """Parse Equifax report format"""
-        return {
-            "format": "Equifax",
-            "bureau": "equifax",
-            "personal_info": self._extract_personal_info(text),
-            "scores": {"equifax": self._extract_score(text, "equifax")},
-            "accounts": self._extract_accounts(text, tables),
-            "inquiries": self._extract_inquiries(text),
-            "public_records": self._extract_public_records(text),
-            "raw_text": text[:50000],
-            "file_path": file_path,
-            "parsed_at": datetime.utcnow().isoformat()
-        }
-    
-    def _parse_experian(self, text: str, tables: List, file_path: str) -> Dict:
-        """Parse Experian report format"""
-        return {
-            "format": "Experian",
-            "bureau": "experian",
-            "personal_info": self._extract_personal_info(text),
-            "scores": {"experian": self._extract_score(text, "experian")},
-            "accounts": self._extract_accounts(text, tables),
-            "inquiries": self._extract_inquiries(text),
-            "public_records": self._extract_public_records(text),
-            "raw_text": text[:50000],
-            "file_path": file_path,
-            "parsed_at": datetime.utcnow().isoformat()
-        }
-    
-    def _parse_transunion(self, text: str, tables: List, file_path: str) -> Dict:
-        """Parse TransUnion report format"""
-        return {
-            "format": "TransUnion",
-            "bureau": "transunion",
-            "personal_info": self._extract_personal_info(text),
-            "scores": {"transunion": self._extract_score(text, "transunion")},
-            "accounts": self._extract_accounts(text, tables),
-            "inquiries": self._extract_inquiries(text),
-            "public_records": self._extract_public_records(text),
-            "raw_text": text[:50000],
-            "file_path": file_path,
-            "parsed_at": datetime.utcnow().isoformat()
-        }
-    
-    def _parse_generic(self, text: str, tables: List, file_path: str) -> Dict:
-        """Generic parser for unknown formats"""
-        return {
-            "format": "Unknown",
-            "bureau": "unknown",
-            "personal_info": self._extract_personal_info(text),
-            "scores": {
-                "equifax": self._extract_score(text, "equifax"),
-                "experian": self._extract_score(text, "experian"),
-                "transunion": self._extract_score(text, "transunion")
-            },
-            "accounts": self._extract_accounts(text, tables),
-            "inquiries": self._extract_inquiries(text),
-            "public_records": self._extract_public_records(text),
-            "raw_text": text[:50000],
-            "file_path": file_path,
-            "parsed_at": datetime.utcnow().isoformat()
         }
\ No newline at end of file
@@ -1,35 +1,59 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy import func
+from sqlalchemy.orm import Session, defer
 from database import get_db
 from models import Client, CreditReport, Dispute
 
 router = APIRouter(prefix="/client-portal", tags=["Client Portal"])
 
+# Disputes still awaiting an outcome
+ACTIVE_DISPUTE_STATUSES = ("pending", "generated", "sent")
+
 @router.get("/dashboard/{client_id}")
 def get_client_dashboard(client_id: int, db: Session = Depends(get_db)):
     """Get client dashboard data"""
-    client = db.query(Client).filter(Client.id == client_id).first()
+    client = db.get(Client, client_id)
     if not client:
         raise HTTPException(status_code=404, detail="Client not found")
     
+    # Counted in the database rather than by loading both collections
+    report_count = db.query(func.count(CreditReport.id)).filter(
+        CreditReport.client_id == client_id
+    ).scalar()
+    active_disputes = db.query(func.count(Dispute.id)).filter(
+        Dispute.client_id == client_id,
+        Dispute.status.in_(ACTIVE_DISPUTE_STATUSES)
+    ).scalar()
+    
     return {
         "client": {
             "id": client.id,
             "name": client.full_name,
             "email": client.email
         },
-        "credit_reports": len(client.credit_reports),
-        "active_disputes": len([d for d in client.disputes if d.status == "active"])
+        "credit_reports": report_count,
+        "active_disputes": active_disputes
     }
 
 @router.get("/reports/{client_id}")
-def get_client_reports(client_id: int, db: Session = Depends(get_db)):
+def get_client_reports(client_id: int, skip: int = 0, limit: int = 50, db: Session = Depends(get_db)):
     """Get client's credit reports"""
-    reports = db.query(CreditReport).filter(CreditReport.client_id == client_id).all()
+    # List view: leave the document text and analysis blobs unloaded
+    reports = db.query(CreditReport).options(
+        defer(CreditReport.raw_text),
+        defer(CreditReport.parsed_data),
+        defer(CreditReport.errors_found),
+        defer(CreditReport.discrepancies)
+    ).filter(
+        CreditReport.client_id == client_id
+    ).order_by(CreditReport.upload_date.desc()).offset(skip).limit(limit).all()
     return {"reports": reports}
 
 @router.get("/disputes/{client_id}")
-def get_client_disputes(client_id: int, db: Session = Depends(get_db)):
+def get_client_disputes(client_id: int, skip: int = 0, limit: int = 50, db: Session = Depends(get_db)):
     """Get client's disputes"""
-    disputes = db.query(Dispute).filter(Dispute.client_id == client_id).all()
+    # List view: leave the generated letter bodies unloaded
+    disputes = db.query(Dispute).options(defer(Dispute.letter_content)).filter(
+        Dispute.client_id == client_id
+    ).order_by(Dispute.created_date.desc()).offset(skip).limit(limit).all()
     return {"disputes": disputes}
\ No newline at end of file
@@ -1,82 +1,32 @@
 import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-from email.mime.application import MIMEApplication
-from typing import List, Optional, Dict
+from email.message import EmailMessage
+from typing import List, Optional, Dict, Callable
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
+from jinja2 import DictLoader, Environment
 from config import settings
+import atexit
+import mimetypes
 import os
+import threading
 import logging
 
 logger = logging.getLogger(__name__)
 
-class EmailService:
-    """Handle email sending for disputes and notifications"""
-    
-    def __init__(self):
-        self.smtp_host = os.getenv("SMTP_HOST") or "smtp.gmail.com"
-        smtp_port_str = os.getenv("SMTP_PORT") or "587"
-        self.smtp_port = int(smtp_port_str) if smtp_port_str else 587
-        self.smtp_user = os.getenv("SMTP_USER") or ""
-        self.smtp_password = os.getenv("SMTP_PASSWORD") or ""
-        self.from_email = os.getenv("FROM_EMAIL") or "noreply@creditrepairpro.com"
-        self.from_name = os.getenv("FROM_NAME") or "CreditRepair Pro"
-    
-    def send_email(self, to_email: str, subject: str, body: str, 
-                   html_body: str = None, attachments: List[str] = None) -> bool:
-        """Send a generic email"""
-        try:
-            msg = MIMEMultipart('alternative')
-            msg['From'] = f"{self.from_name} <{self.from_email}>"
-            msg['To'] = to_email
-            msg['Subject'] = subject
-            
-            # Plain text body
-            msg.attach(MIMEText(body, 'plain'))
-            
-            # HTML body if provided
-            if html_body:
-                msg.attach(MIMEText(html_body, 'html'))
-            
-            # Attachments
-            if attachments:
-                for file_path in attachments:
-                    if os.path.exists(file_path):
-                        with open(file_path, 'rb') as f:
-                            attachment = MIMEApplication(f.read())
-                            attachment.add_header(
-                                'Content-Disposition',
-                                'attachment',
-                                filename=os.path.basename(file_path)
-                            )
-                            msg.attach(attachment)
-            
-            with smtplib.SMTP(self.smtp_host, self.smtp_port) as server:
-                server.starttls()
-                server.login(self.smtp_user, self.smtp_password)
-                server.send_message(msg)
-            
-            logger.info(f"Email sent to {to_email}")
-            return True
-            
-        except Exception as e:
-            logger.error(f"Email send failed: {str(e)}")
-            return False
-    
-    def send_welcome(self, to_email: str, client_name: str) -> bool:
-        """Send welcome email"""
-        subject = "Welcome to CreditRepair Pro!"
-        
-        html_body = f"""
+# Email bodies keyed by template name. HTML templates share the company_*
+# contact fields cached on EmailService.
+_EMAIL_SOURCES = {
+    "welcome.html": """
         <!DOCTYPE html>
         <html>
         <head>
             <style>
-                body {{ font-family: Arial, sans-serif; line-height: 1.6; color: #333; }}
-                .container {{ max-width: 600px; margin: 0 auto; padding: 20px; }}
-                .header {{ background: #2563eb; color: white; padding: 20px; text-align: center; }}
-                .content {{ background: #f9fafb; padding: 30px; }}
-                .footer {{ text-align: center; padding: 20px; color: #6b7280; font-size: 12px; }}
-                .btn {{ background: #2563eb; color: white; padding: 12px 24px; text-decoration: none; border-radius: 5px; display: inline-block; }}
+                body { font-family: Arial, sans-serif; line-height: 1.6; color: #333; }
+                .container { max-width: 600px; margin: 0 auto; padding: 20px; }
+                .header { background: #2563eb; color: white; padding: 20px; text-align: center; }
+                .content { background: #f9fafb; padding: 30px; }
+                .footer { text-align: center; padding: 20px; color: #6b7280; font-size: 12px; }
+                .btn { background: #2563eb; color: white; padding: 12px 24px; text-decoration: none; border-radius: 5px; display: inline-block; }
             </style>
         </head>
         <body>
@@ -85,7 +35,7 @@ class EmailService:
                     <h1>Welcome to CreditRepair Pro!</h1>
                 </div>
                 <div class="content">
-                    <h2>Hi {client_name},</h2>
+                    <h2>Hi {{ client_name }},</h2>
                     <p>Thank you for choosing CreditRepair Pro! We're excited to help you on your journey to better credit.</p>
                     
                     <h3>Next Steps:</h3>
@@ -96,22 +46,21 @@ class EmailService:
                         <li>Approve your dispute letters</li>
                     </ul>
                     
-                    <p>If you have any questions, reply to this email or contact us at {os.getenv('COMPANY_PHONE', '(305) 747-3973')}.</p>
+                    <p>If you have any questions, reply to this email or contact us at {{ company_phone }}.</p>
                     
-                    <p><a href="{os.getenv('COMPANY_URL', '')}/client/dashboard" class="btn">Go to Dashboard</a></p>
+                    <p><a href="{{ company_url }}/client/dashboard" class="btn">Go to Dashboard</a></p>
                 </div>
                 <div class="footer">
                     <p>© 2025 CreditRepair Pro. All rights reserved.</p>
-                    <p>{os.getenv('COMPANY_ADDRESS', 'Miami, FL')}</p>
+                    <p>{{ company_address }}</p>
                 </div>
             </div>
         </body>
         </html>
-        """
-        
-        plain_body = f"""Welcome to CreditRepair Pro!
+        """,
+    "welcome.txt": """Welcome to CreditRepair Pro!
 
-Hi {client_name},
+Hi {{ client_name }},
 
 Thank you for choosing CreditRepair Pro! We're excited to help you on your journey to better credit.
 
@@ -121,32 +70,24 @@ Next Steps:
 3. Review our error analysis
 4. Approve your dispute letters
 
-If you have any questions, contact us at {os.getenv('COMPANY_PHONE', '(305) 747-3973')}.
+If you have any questions, contact us at {{ company_phone }}.
 
 Best regards,
 CreditRepair Pro Team
-"""
-        
-        return self.send_email(to_email, subject, plain_body, html_body)
-    
-    def send_analysis_complete(self, to_email: str, client_name: str, 
-                               error_count: int, dispute_count: int) -> bool:
-        """Send analysis completion email"""
-        subject = "Your Credit Report Analysis is Complete"
-        
-        html_body = f"""
+""",
+    "analysis_complete.html": """
         <!DOCTYPE html>
         <html>
         <head>
             <style>
-                body {{ font-family: Arial, sans-serif; line-height: 1.6; color: #333; }}
-                .container {{ max-width: 600px; margin: 0 auto; padding: 20px; }}
-                .header {{ background: #059669; color: white; padding: 20px; text-align: center; }}
-                .content {{ background: #f9fafb; padding: 30px; }}
-                .stats {{ display: flex; justify-content: space-around; margin: 20px 0; }}
-                .stat {{ text-align: center; }}
-                .stat-number {{ font-size: 36px; font-weight: bold; color: #dc2626; }}
-                .btn {{ background: #2563eb; color: white; padding: 12px 24px; text-decoration: none; border-radius: 5px; display: inline-block; margin-top: 20px; }}
+                body { font-family: Arial, sans-serif; line-height: 1.6; color: #333; }
+                .container { max-width: 600px; margin: 0 auto; padding: 20px; }
+                .header { background: #059669; color: white; padding: 20px; text-align: center; }
+                .content { background: #f9fafb; padding: 30px; }
+                .stats { display: flex; justify-content: space-around; margin: 20px 0; }
+                .stat { text-align: center; }
+                .stat-number { font-size: 36px; font-weight: bold; color: #dc2626; }
+                .btn { background: #2563eb; color: white; padding: 12px 24px; text-decoration: none; border-radius: 5px; display: inline-block; margin-top: 20px; }
             </style>
         </head>
         <body>
@@ -155,75 +96,59 @@ CreditRepair Pro Team
                     <h1>Analysis Complete! 🎉</h1>
                 </div>
                 <div class="content">
-                    <p>Hi {client_name},</p>
+                    <p>Hi {{ client_name }},</p>
                     <p>We've completed the analysis of your credit report. Here's what we found:</p>
                     
                     <div class="stats">
                         <div class="stat">
-                            <div class="stat-number">{error_count}</div>
+                            <div class="stat-number">{{ error_count }}</div>
                             <div>Errors Found</div>
                         </div>
                         <div class="stat">
-                            <div class="stat-number">{dispute_count}</div>
+                            <div class="stat-number">{{ dispute_count }}</div>
                             <div>Disputes Recommended</div>
                         </div>
                     </div>
                     
                     <p>Log in to your dashboard to review the detailed analysis and approve your dispute letters.</p>
                     
-                    <a href="{os.getenv('COMPANY_URL', '')}/client/dashboard" class="btn">View Analysis</a>
+                    <a href="{{ company_url }}/client/dashboard" class="btn">View Analysis</a>
                 </div>
             </div>
         </body>
         </html>
-        """
-        
-        plain_body = f"""Analysis Complete!
+        """,
+    "analysis_complete.txt": """Analysis Complete!
 
-Hi {client_name},
+Hi {{ client_name }},
 
 We've completed the analysis of your credit report.
 
 Results:
-- Errors Found: {error_count}
-- Disputes Recommended: {dispute_count}
+- Errors Found: {{ error_count }}
+- Disputes Recommended: {{ dispute_count }}
 
 Log in to your dashboard to review the detailed analysis.
 
-{os.getenv('COMPANY_URL', '')}/client/dashboard
-"""
-        
-        return self.send_email(to_email, subject, plain_body, html_body)
-    
-    def send_letters_ready(self, to_email: str, client_name: str, letter_count: int) -> bool:
-        """Send letters ready notification"""
-        subject = "Your Dispute Letters Are Ready"
-        
-        html_body = f"""
+{{ company_url }}/client/dashboard
+""",
+    "letters_ready.html": """
         <!DOCTYPE html>
         <html>
         <body style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto; padding: 20px;">
-            <h2>Your Dispute Letters Are Ready, {client_name}!</h2>
+            <h2>Your Dispute Letters Are Ready, {{ client_name }}!</h2>
             
-            <p>We've generated {letter_count} customized dispute letters for you.</p>
+            <p>We've generated {{ letter_count }} customized dispute letters for you.</p>
             
             <p><strong>Important:</strong> Send these letters via certified mail with return receipt requested.</p>
             
-            <p><a href="{os.getenv('COMPANY_URL', '')}/client/letters" style="background: #2563eb; color: white; padding: 12px 24px; text-decoration: none; border-radius: 5px; display: inline-block;">Download Letters</a></p>
+            <p><a href="{{ company_url }}/client/letters" style="background: #2563eb; color: white; padding: 12px 24px; text-decoration: none; border-radius: 5px; display: inline-block;">Download Letters</a></p>
         </body>
         </html>
-        """
-        
-        return self.send_email(to_email, subject, "Your dispute letters are ready. Download them from your dashboard.", html_body)
-    
-    def send_follow_up_reminder(self, to_email: str, client_name: str, 
-                                 bureau: str, days_overdue: int) -> bool:
-        """Send follow-up reminder"""
-        subject = f"Action Required: {bureau.title()} Dispute Follow-Up"
-        
-        body = f"""Hi {client_name},
+        """,
+    "follow_up_reminder.txt": """Hi {{ client_name }},
 
-This is a reminder that {bureau.title()} has not responded to your dispute sent {days_overdue} days ago.
+This is a reminder that {{ bureau_name }} has not responded to your dispute sent {{ days_overdue }} days ago.
 
 Under the Fair Credit Reporting Act, credit bureaus must respond within 30 days.
 
@@ -236,50 +161,36 @@ Log in to your dashboard for the follow-up letter template.
 
 Best regards,
 CreditRepair Pro Team
-"""
-        return self.send_email(to_email, subject, body)
-    
-    def send_payment_receipt(self, to_email: str, client_name: str, 
-                             amount: float, description: str) -> bool:
-        """Send payment receipt"""
-        subject = "Payment Receipt - CreditRepair Pro"
-        
-        html_body = f"""
+""",
+    "payment_receipt.html": """
         <!DOCTYPE html>
         <html>
         <body style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto; padding: 20px;">
             <h2>Payment Receipt</h2>
             
-            <p>Hi {client_name},</p>
+            <p>Hi {{ client_name }},</p>
             
             <p>Thank you for your payment!</p>
             
             <table style="width: 100%; border-collapse: collapse; margin: 20px 0;">
                 <tr>
                     <td style="padding: 10px; border-bottom: 1px solid #ddd;"><strong>Description:</strong></td>
-                    <td style="padding: 10px; border-bottom: 1px solid #ddd;">{description}</td>
+                    <td style="padding: 10px; border-bottom: 1px solid #ddd;">{{ description }}</td>
                 </tr>
                 <tr>
                     <td style="padding: 10px; border-bottom: 1px solid #ddd;"><strong>Amount:</strong></td>
-                    <td style="padding: 10px; border-bottom: 1px solid #ddd;">${amount:.2f}</td>
+                    <td style="padding: 10px; border-bottom: 1px solid #ddd;">${{ "%.2f"|format(amount) }}</td>
                 </tr>
                 <tr>
                     <td style="padding: 10px;"><strong>Date:</strong></td>
-                    <td style="padding: 10px;">{datetime.utcnow().strftime('%B %d, %Y')}</td>
+                    <td style="padding: 10px;">{{ date }}</td>
                 </tr>
             </table>
             
         </body>
         </html>
-        """
-        
-        return self.send_email(to_email, subject, f"Payment of ${amount:.2f} received. Thank you!", html_body)
-    
-    def send_password_reset(self, to_email: str, reset_link: str) -> bool:
-        """Send password reset email"""
-        subject = "Password Reset Request"
-        
-        html_body = f"""
+        """,
+    "password_reset.html": """
         <!DOCTYPE html>
         <html>
         <body style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto; padding: 20px;">
@@ -287,11 +198,228 @@ CreditRepair Pro Team
             
             <p>You requested a password reset. Click the link below to reset your password:</p>
             
-            <p><a href="{reset_link}" style="background: #2563eb; color: white; padding: 12px 24px; text-decoration: none; border-radius: 5px; display: inline-block;">Reset Password</a></p>
+            <p><a href="{{ reset_link }}" style="background: #2563eb; color: white; padding: 12px 24px; text-decoration: none; border-radius: 5px; display: inline-block;">Reset Password</a></p>
             
             <p style="color: #666; font-size: 12px;">This link expires in 1 hour. If you didn't request this, please ignore this email.</p>
         </body>
         </html>
-        """
+        """,
+    "monthly_report.html": """
+                <!DOCTYPE html>
+                <html>
+                <body style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto; padding: 20px;">
+                    <h2>Monthly Progress Report</h2>
+                    
+                    <p>Hi {{ client_name }},</p>
+                    
+                    <p>Here's your credit repair progress for the past month:</p>
+                    
+                    <ul>
+                        <li>✅ Items Deleted: {{ deleted }}</li>
+                        <li>📝 Items Updated: {{ updated }}</li>
+                        <li>🔍 Items Verified: {{ verified }}</li>
+                        <li>⏳ Pending: {{ pending }}</li>
+                    </ul>
+                    
+                    <p>Keep up the great work! Log in to see your full progress.</p>
+                </body>
+                </html>
+                """,
+}
+
+# Compiled once at import; rendering only walks the precompiled template
+_env = Environment(
+    loader=DictLoader(_EMAIL_SOURCES),
+    autoescape=False,
+    keep_trailing_newline=True
+)
+_TEMPLATES = {name: _env.get_template(name) for name in _EMAIL_SOURCES}
+
+class EmailService:
+    """Handle email sending for disputes and notifications"""
+    
+    def __init__(self):
+        self.smtp_host = os.getenv("SMTP_HOST") or "smtp.gmail.com"
+        smtp_port_str = os.getenv("SMTP_PORT") or "587"
+        self.smtp_port = int(smtp_port_str) if smtp_port_str else 587
+        self.smtp_user = os.getenv("SMTP_USER") or ""
+        self.smtp_password = os.getenv("SMTP_PASSWORD") or ""
+        self.from_email = os.getenv("FROM_EMAIL") or "noreply@creditrepairpro.com"
+        self.from_name = os.getenv("FROM_NAME") or "CreditRepair Pro"
+        self.company_phone = os.getenv("COMPANY_PHONE", "(305) 747-3973")
+        self.company_url = os.getenv("COMPANY_URL", "")
+        self.company_address = os.getenv("COMPANY_ADDRESS", "Miami, FL")
+        
+        # One authenticated connection reused across sends
+        self._smtp = None
+        self._smtp_lock = threading.Lock()
+        # Queued sends run off the caller's thread; one worker for the one connection
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="email")
+        atexit.register(self.close)
+    
+    def submit(self, send: Callable[..., bool], *args, **kwargs) -> Future:
+        """Queue a send_* call on the background email worker"""
+        return self._executor.submit(send, *args, **kwargs)
+    
+    def _get_smtp(self) -> smtplib.SMTP:
+        """Return the open SMTP connection, connecting and logging in if needed"""
+        if self._smtp is None:
+            server = smtplib.SMTP(self.smtp_host, self.smtp_port)
+            try:
+                server.starttls()
+                server.login(self.smtp_user, self.smtp_password)
+            except Exception:
+                server.close()
+                raise
+            self._smtp = server
+        return self._smtp
+    
+    def _send_message(self, msg: EmailMessage):
+        """Send on the shared connection, reconnecting once if the server dropped it"""
+        with self._smtp_lock:
+            try:
+                self._get_smtp().send_message(msg)
+            except smtplib.SMTPServerDisconnected:
+                # Idle connections get closed server-side; retry on a fresh one
+                self._smtp = None
+                self._get_smtp().send_message(msg)
+    
+    def close(self):
+        """Flush queued sends and close the shared SMTP connection"""
+        self._executor.shutdown(wait=True)
+        with self._smtp_lock:
+            if self._smtp is not None:
+                try:
+                    self._smtp.quit()
+                except (smtplib.SMTPException, OSError):
+                    pass
+                self._smtp = None
+    
+    def send_email(self, to_email: str, subject: str, body: str, 
+                   html_body: str = None, attachments: List[str] = None) -> bool:
+        """Send a generic email"""
+        try:
+            msg = EmailMessage()
+            msg['From'] = f"{self.from_name} <{self.from_email}>"
+            msg['To'] = to_email
+            msg['Subject'] = subject
+            
+            # Plain text body
+            msg.set_content(body)
+            
+            # HTML body if provided
+            if html_body:
+                msg.add_alternative(html_body, subtype='html')
+            
+            # Attachments go in a multipart/mixed wrapper around the bodies;
+            # each file's bytes are dropped once encoded into its part
+            if attachments:
+                for file_path in attachments:
+                    if os.path.exists(file_path):
+                        content_type = mimetypes.guess_type(file_path)[0] or 'application/octet-stream'
+                        maintype, subtype = content_type.split('/', 1)
+                        with open(file_path, 'rb') as f:
+                            msg.add_attachment(
+                                f.read(),
+                                maintype=maintype,
+                                subtype=subtype,
+                                filename=os.path.basename(file_path)
+                            )
+            
+            self._send_message(msg)
+            
+            logger.info(f"Email sent to {to_email}")
+            return True
+            
+        except Exception as e:
+            logger.error(f"Email send failed: {str(e)}")
+            return False
+    
+    def send_welcome(self, to_email: str, client_name: str) -> bool:
+        """Send welcome email"""
+        subject = "Welcome to CreditRepair Pro!"
+        
+        html_body = _TEMPLATES["welcome.html"].render(
+            client_name=client_name,
+            company_phone=self.company_phone,
+            company_url=self.company_url,
+            company_address=self.company_address
+        )
+        plain_body = _TEMPLATES["welcome.txt"].render(
+            client_name=client_name, company_phone=self.company_phone
+        )
+        
+        return self.send_email(to_email, subject, plain_body, html_body)
+    
+    def send_analysis_complete(self, to_email: str, client_name: str, 
+                               error_count: int, dispute_count: int) -> bool:
+        """Send analysis completion email"""
+        subject = "Your Credit Report Analysis is Complete"
+        
+        context = {
+            "client_name": client_name,
+            "error_count": error_count,
+            "dispute_count": dispute_count,
+            "company_url": self.company_url
+        }
+        html_body = _TEMPLATES["analysis_complete.html"].render(context)
+        plain_body = _TEMPLATES["analysis_complete.txt"].render(context)
+        
+        return self.send_email(to_email, subject, plain_body, html_body)
+    
+    def send_letters_ready(self, to_email: str, client_name: str, letter_count: int) -> bool:
+        """Send letters ready notification"""
+        subject = "Your Dispute Letters Are Ready"
+        
+        html_body = _TEMPLATES["letters_ready.html"].render(
+            client_name=client_name, letter_count=letter_count, company_url=self.company_url
+        )
+        
+        return self.send_email(to_email, subject, "Your dispute letters are ready. Download them from your dashboard.", html_body)
+    
+    def send_follow_up_reminder(self, to_email: str, client_name: str, 
+                                 bureau: str, days_overdue: int) -> bool:
+        """Send follow-up reminder"""
+        subject = f"Action Required: {bureau.title()} Dispute Follow-Up"
+        
+        body = _TEMPLATES["follow_up_reminder.txt"].render(
+            client_name=client_name, bureau_name=bureau.title(), days_overdue=days_overdue
+        )
+        return self.send_email(to_email, subject, body)
+    
+    def send_payment_receipt(self, to_email: str, client_name: str, 
+                             amount: float, description: str) -> bool:
+        """Send payment receipt"""
+        subject = "Payment Receipt - CreditRepair Pro"
+        
+        html_body = _TEMPLATES["payment_receipt.html"].render(
+            client_name=client_name,
+            description=description,
+            amount=amount,
+            date=datetime.utcnow().strftime('%B %d, %Y')
+        )
+        
+        return self.send_email(to_email, subject, f"Payment of ${amount:.2f} received. Thank you!", html_body)
+    
+    def send_password_reset(self, to_email: str, reset_link: str) -> bool:
+        """Send password reset email"""
+        subject = "Password Reset Request"
+        
+        html_body = _TEMPLATES["password_reset.html"].render(reset_link=reset_link)
+        
+        return self.send_email(to_email, subject, f"Reset your password: {reset_link}", html_body)
+    
+    def send_monthly_report(self, to_email: str, client_name: str, deleted: int,
+                            updated: int, verified: int, pending: int) -> bool:
+        """Send monthly progress report"""
+        subject = "Your Monthly Credit Repair Progress Report"
+        
+        html_body = _TEMPLATES["monthly_report.html"].render(
+            client_name=client_name,
+            deleted=deleted,
+            updated=updated,
+            verified=verified,
+            pending=pending
+        )
         
-        return self.send_email(to_email, subject, f"Reset your password: {reset_link}", html_body)
\ No newline at end of file
+        return self.send_email(to_email, subject, f"Monthly progress: {deleted} deleted, {updated} updated, {verified} verified, {pending} pending", html_body)
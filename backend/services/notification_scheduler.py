@@ -1,193 +1,300 @@
+import asyncio
+from contextlib import contextmanager
 from datetime import datetime, timedelta
+from types import MappingProxyType
 from typing import List, Dict
+from sqlalchemy import func, insert, select, update
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from models import Dispute, User, Notification, Client
+from models import Dispute, User, Notification, Client, SchedulerRun
 from services.email_service import EmailService
 import logging
+import socket
 
 logger = logging.getLogger(__name__)
 
+# Days after sending before a follow-up reminder goes out
+FOLLOW_UP_AFTER_DAYS = 25
+# FCRA window for a bureau to respond to a dispute
+RESPONSE_DEADLINE_DAYS = 30
+# Span of disputes covered by a monthly progress report
+MONTHLY_REPORT_DAYS = 30
+
+# An unfinished run claimed longer ago than this is taken to have died
+SCHEDULER_RUN_STALE_AFTER = timedelta(hours=1)
+
+# Daily check result key -> the method that runs it
+DAILY_CHECKS = MappingProxyType({
+    "follow_up_reminders": "check_follow_up_reminders",
+    "deadline_violations": "check_deadline_violations",
+    "monthly_reports": "send_monthly_reports",
+})
+
+# Client.full_name computed in SQL, for queries that select columns only
+CLIENT_FULL_NAME = (Client.first_name + " " + Client.last_name).label("full_name")
+
+# One login per client (the lowest user id), so a client with several users
+# is joined to a single row rather than once per user
+CLIENT_USER_ID = select(func.min(User.id)).where(
+    User.client_id == Client.id
+).correlate(Client).scalar_subquery()
+
 class NotificationScheduler:
     """Automated notification and reminder system"""
     
-    def __init__(self, db: Session):
+    def __init__(self, db: Session, email_service: EmailService):
         self.db = db
-        self.email_service = EmailService()
+        # Shared service: each EmailService owns an SMTP connection and a
+        # sender thread, so schedulers never build their own
+        self.email_service = email_service
     
     def run_daily_checks(self) -> Dict:
         """Run all daily notification checks"""
-        results = {
-            "follow_up_reminders": [],
-            "deadline_violations": [],
-            "monthly_reports": []
-        }
+        # One clock reading shared by every check in the run
+        now = datetime.utcnow()
         
-        # Check for follow-ups needed
-        results["follow_up_reminders"] = self.check_follow_up_reminders()
+        return {key: self._run_daily_check(key, check, now) for key, check in DAILY_CHECKS.items()}
+    
+    async def run_daily_checks_async(self) -> Dict:
+        """Run the daily checks concurrently, each on its own session"""
+        now = datetime.utcnow()
         
-        # Check for deadline violations
-        results["deadline_violations"] = self.check_deadline_violations()
+        # The checks touch disjoint rows, so their DB waits can overlap
+        outcomes = await asyncio.gather(*(
+            asyncio.to_thread(self._run_check_in_session, key, check, now)
+            for key, check in DAILY_CHECKS.items()
+        ))
+        return dict(zip(DAILY_CHECKS, outcomes))
+    
+    def _run_check_in_session(self, key: str, check: str, now: datetime) -> List[Dict]:
+        """Run one check on a session of its own (sessions are not thread-safe)"""
+        db = Session(self.db.get_bind())
+        try:
+            scheduler = NotificationScheduler(db, self.email_service)
+            return scheduler._run_daily_check(key, check, now)
+        finally:
+            db.close()
+    
+    def _run_daily_check(self, key: str, check: str, now: datetime) -> List[Dict]:
+        """Run one daily check unless it already ran, or is running, today"""
+        # Each check is claimed on its own, so a failed check is retried
+        # without repeating the ones that finished
+        with self._claim_run(f"scheduler:{key}:{now:%Y-%m-%d}", now) as claimed:
+            if not claimed:
+                logger.info(f"Daily {key} check already ran today; skipping")
+                return []
+            return getattr(self, check)(now)
+    
+    @contextmanager
+    def _claim_run(self, name: str, now: datetime):
+        """Hold a run marker for the block; yields False if the run finished or is live elsewhere"""
+        host = socket.gethostname()
+        self.db.add(SchedulerRun(name=name, host=host, started_at=now))
+        try:
+            # Primary key conflict: another instance claimed this run (concurrent
+            # inserts wait on the first transaction, then fail here)
+            self.db.commit()
+        except IntegrityError:
+            self.db.rollback()
+            # Only a claim that never finished and has gone stale is taken over
+            retaken = self.db.execute(
+                update(SchedulerRun).where(
+                    SchedulerRun.name == name,
+                    SchedulerRun.finished_at.is_(None),
+                    SchedulerRun.started_at < now - SCHEDULER_RUN_STALE_AFTER
+                ).values(host=host, started_at=now)
+            ).rowcount
+            self.db.commit()
+            if not retaken:
+                yield False
+                return
+            logger.warning(f"Retaking stale scheduler run {name}")
         
-        # Send monthly progress reports
-        results["monthly_reports"] = self.send_monthly_reports()
+        # Marked finished inside the block's own transaction: the check's
+        # commit lands its work and the marker together, and a failure before
+        # that commit rolls both back, leaving the claim to go stale
+        run = self.db.get(SchedulerRun, name)
+        run.finished_at = now
+        try:
+            yield True
+        except Exception:
+            self.db.rollback()
+            raise
         
-        return results
+        run.finished_at = datetime.utcnow()
+        self.db.commit()
     
-    def check_follow_up_reminders(self) -> List[Dict]:
+    def check_follow_up_reminders(self, now: datetime = None) -> List[Dict]:
         """Check for disputes needing follow-up (25+ days since sent)"""
-        cutoff_date = datetime.utcnow() - timedelta(days=25)
+        now = now or datetime.utcnow()
+        cutoff_date = now - timedelta(days=FOLLOW_UP_AFTER_DAYS)
         
-        disputes = self.db.query(Dispute).filter(
+        # Just the columns the reminder uses; the inner joins drop disputes
+        # whose client has no login
+        disputes = self.db.query(
+            Dispute.id,
+            Dispute.bureau,
+            Dispute.sent_date,
+            CLIENT_FULL_NAME,
+            User.id,
+            User.email
+        ).join(Dispute.client).join(User, User.id == CLIENT_USER_ID).filter(
             Dispute.status == "sent",
             Dispute.sent_date <= cutoff_date,
             Dispute.follow_up_date.is_(None)
         ).all()
         
+        # Claim follow-ups in one UPDATE; rows another run already claimed
+        # fail the IS NULL check and are left to it
+        claimed = set()
+        if disputes:
+            claimed = set(self.db.execute(
+                update(Dispute).where(
+                    Dispute.id.in_([dispute_id for dispute_id, *_ in disputes]),
+                    Dispute.follow_up_date.is_(None)
+                ).values(follow_up_date=now).returning(Dispute.id),
+                execution_options={"synchronize_session": False}
+            ).scalars())
+        
         reminders = []
-        for dispute in disputes:
-            client = self.db.query(Client).get(dispute.client_id)
-            user = self.db.query(User).filter_by(client_id=client.id).first()
+        notifications = []
+        outbox = []
+        for dispute_id, bureau, sent_date, client_name, user_id, email in disputes:
+            if dispute_id not in claimed:
+                continue
             
-            if user and client:
-                days_sent = (datetime.utcnow() - dispute.sent_date).days
-                
-                # Send reminder
-                self.email_service.send_follow_up_reminder(
-                    user.email,
-                    client.full_name,
-                    dispute.bureau,
-                    days_sent
-                )
-                
-                # Update follow-up date
-                dispute.follow_up_date = datetime.utcnow()
-                
-                # Create notification
-                self.create_notification(
-                    user.id,
-                    "Follow-Up Reminder",
-                    f"Your {dispute.bureau.title()} dispute from {days_sent} days ago needs follow-up.",
-                    "dispute_update"
-                )
-                
-                reminders.append({
-                    "dispute_id": dispute.id,
-                    "client": client.full_name,
-                    "bureau": dispute.bureau,
-                    "days_sent": days_sent
-                })
+            days_sent = (now - sent_date).days
+            
+            # Reminder is queued once the follow-up date is committed
+            outbox.append((email, client_name, bureau, days_sent))
+            
+            notifications.append({
+                "user_id": user_id,
+                "title": "Follow-Up Reminder",
+                "message": f"Your {bureau.title()} dispute from {days_sent} days ago needs follow-up.",
+                "notification_type": "dispute_update"
+            })
+            
+            reminders.append({
+                "dispute_id": dispute_id,
+                "client": client_name,
+                "bureau": bureau,
+                "days_sent": days_sent
+            })
         
+        # Follow-up dates and notifications land in one transaction
+        self.insert_notifications(notifications)
         self.db.commit()
+        
+        # Only after the commit, so a rolled-back run sends nothing
+        for reminder_args in outbox:
+            self.email_service.submit(self.email_service.send_follow_up_reminder, *reminder_args)
+        
         logger.info(f"Sent {len(reminders)} follow-up reminders")
         return reminders
     
-    def check_deadline_violations(self) -> List[Dict]:
+    def check_deadline_violations(self, now: datetime = None) -> List[Dict]:
         """Check for disputes past the 30-day response deadline"""
-        cutoff_date = datetime.utcnow() - timedelta(days=30)
+        now = now or datetime.utcnow()
+        cutoff_date = now - timedelta(days=RESPONSE_DEADLINE_DAYS)
         
-        disputes = self.db.query(Dispute).filter(
+        # Just the columns the notification uses; the inner joins drop
+        # disputes whose client has no login
+        disputes = self.db.query(
+            Dispute.id,
+            Dispute.bureau,
+            Dispute.sent_date,
+            CLIENT_FULL_NAME,
+            User.id
+        ).join(Dispute.client).join(User, User.id == CLIENT_USER_ID).filter(
             Dispute.status == "sent",
             Dispute.sent_date <= cutoff_date,
             Dispute.response_type.is_(None)
         ).all()
         
         violations = []
-        for dispute in disputes:
-            client = self.db.query(Client).get(dispute.client_id)
-            user = self.db.query(User).filter_by(client_id=client.id).first()
+        notifications = []
+        for dispute_id, bureau, sent_date, client_name, user_id in disputes:
+            days_overdue = (now - sent_date).days - RESPONSE_DEADLINE_DAYS
+            
+            notifications.append({
+                "user_id": user_id,
+                "title": "Response Deadline Violation",
+                "message": f"{bureau.title()} has not responded to your dispute ({days_overdue} days overdue). Consider filing a CFPB complaint.",
+                "notification_type": "dispute_update"
+            })
             
-            if user:
-                days_overdue = (datetime.utcnow() - dispute.sent_date).days - 30
-                
-                # Create notification
-                self.create_notification(
-                    user.id,
-                    "Response Deadline Violation",
-                    f"{dispute.bureau.title()} has not responded to your dispute ({days_overdue} days overdue). Consider filing a CFPB complaint.",
-                    "dispute_update"
-                )
-                
-                violations.append({
-                    "dispute_id": dispute.id,
-                    "client": client.full_name,
-                    "bureau": dispute.bureau,
-                    "days_overdue": days_overdue
-                })
+            violations.append({
+                "dispute_id": dispute_id,
+                "client": client_name,
+                "bureau": bureau,
+                "days_overdue": days_overdue
+            })
         
+        # One transaction for the whole batch of notifications
+        self.insert_notifications(notifications)
+        self.db.commit()
         logger.info(f"Found {len(violations)} deadline violations")
         return violations
     
-    def send_monthly_reports(self) -> List[Dict]:
+    def send_monthly_reports(self, now: datetime = None) -> List[Dict]:
         """Send monthly progress reports to active clients"""
         # Get active subscriptions
-        one_month_ago = datetime.utcnow() - timedelta(days=30)
+        one_month_ago = (now or datetime.utcnow()) - timedelta(days=MONTHLY_REPORT_DAYS)
         
-        active_clients = self.db.query(Client).join(User).filter(
+        # Last month's dispute outcomes per client, aggregated in the database
+        monthly_counts = self.db.query(
+            Dispute.client_id,
+            func.count().label("total"),
+            func.count().filter(Dispute.response_type == "deleted").label("deleted"),
+            func.count().filter(Dispute.response_type == "updated").label("updated"),
+            func.count().filter(Dispute.response_type == "verified").label("verified"),
+            func.count().filter(Dispute.status == "sent").label("pending")
+        ).filter(
+            Dispute.created_date >= one_month_ago
+        ).group_by(Dispute.client_id).subquery()
+        
+        # Inner join: clients with no disputes this month never leave the database
+        active_clients = self.db.query(
+            Client.id,
+            CLIENT_FULL_NAME,
+            User.email,
+            monthly_counts.c.total,
+            monthly_counts.c.deleted,
+            monthly_counts.c.updated,
+            monthly_counts.c.verified,
+            monthly_counts.c.pending
+        ).join(User, User.id == CLIENT_USER_ID).join(
+            monthly_counts, monthly_counts.c.client_id == Client.id
+        ).filter(
             User.is_active == True
         ).all()
         
         reports = []
-        for client in active_clients:
-            user = self.db.query(User).filter_by(client_id=client.id).first()
-            if not user:
-                continue
-            
-            # Get last month's disputes
-            monthly_disputes = self.db.query(Dispute).filter(
-                Dispute.client_id == client.id,
-                Dispute.created_date >= one_month_ago
-            ).all()
+        for client_id, client_name, email, total, deleted, updated, verified, pending in active_clients:
+            # Send monthly report email
+            self.email_service.submit(
+                self.email_service.send_monthly_report,
+                email,
+                client_name,
+                deleted,
+                updated,
+                verified,
+                pending
+            )
             
-            if monthly_disputes:
-                # Count outcomes
-                deleted = sum(1 for d in monthly_disputes if d.response_type == "deleted")
-                updated = sum(1 for d in monthly_disputes if d.response_type == "updated")
-                verified = sum(1 for d in monthly_disputes if d.response_type == "verified")
-                pending = sum(1 for d in monthly_disputes if d.status == "sent")
-                
-                # Send monthly report email
-                subject = "Your Monthly Credit Repair Progress Report"
-                
-                html_body = f"""
-                <!DOCTYPE html>
-                <html>
-                <body style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto; padding: 20px;">
-                    <h2>Monthly Progress Report</h2>
-                    
-                    <p>Hi {client.full_name},</p>
-                    
-                    <p>Here's your credit repair progress for the past month:</p>
-                    
-                    <ul>
-                        <li>✅ Items Deleted: {deleted}</li>
-                        <li>📝 Items Updated: {updated}</li>
-                        <li>🔍 Items Verified: {verified}</li>
-                        <li>⏳ Pending: {pending}</li>
-                    </ul>
-                    
-                    <p>Keep up the great work! Log in to see your full progress.</p>
-                </body>
-                </html>
-                """
-                
-                self.email_service.send_email(
-                    user.email,
-                    subject,
-                    f"Monthly progress: {deleted} deleted, {updated} updated, {verified} verified, {pending} pending",
-                    html_body
-                )
-                
-                reports.append({
-                    "client_id": client.id,
-                    "name": client.full_name,
-                    "disputes_sent": len(monthly_disputes)
-                })
+            reports.append({
+                "client_id": client_id,
+                "name": client_name,
+                "disputes_sent": total
+            })
         
         logger.info(f"Sent {len(reports)} monthly reports")
         return reports
     
     def create_notification(self, user_id: int, title: str, message: str, 
-                           notification_type: str, link: str = None) -> Notification:
+                           notification_type: str, link: str = None,
+                           commit: bool = True) -> Notification:
         """Create a notification for a user"""
         notification = Notification(
             user_id=user_id,
@@ -198,10 +305,17 @@ class NotificationScheduler:
         )
         
         self.db.add(notification)
-        self.db.commit()
+        if commit:
+            self.db.commit()
         
         return notification
     
+    def insert_notifications(self, rows: List[Dict]) -> None:
+        """Bulk insert notification rows without building ORM objects (caller commits)"""
+        if rows:
+            # executemany-style INSERT; column defaults still apply
+            self.db.execute(insert(Notification), rows)
+    
     def get_unread_notifications(self, user_id: int) -> List[Notification]:
         """Get unread notifications for a user"""
         return self.db.query(Notification).filter(
@@ -0,0 +1,49 @@
+import boto3
+from botocore.exceptions import BotoCoreError, ClientError
+from typing import Dict
+from config import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Presigned upload URLs stay valid for 15 minutes
+PRESIGN_EXPIRES_SECONDS = 900
+
+class StorageService:
+    """S3 storage for uploaded credit reports"""
+
+    def __init__(self):
+        self.bucket = settings.S3_BUCKET
+        self.client = boto3.client(
+            "s3",
+            aws_access_key_id=settings.AWS_ACCESS_KEY,
+            aws_secret_access_key=settings.AWS_SECRET_KEY
+        )
+
+    def create_upload_url(self, key: str, content_type: str) -> Dict:
+        """Presign a PUT so the browser uploads straight to S3"""
+        try:
+            url = self.client.generate_presigned_url(
+                "put_object",
+                Params={"Bucket": self.bucket, "Key": key, "ContentType": content_type},
+                ExpiresIn=PRESIGN_EXPIRES_SECONDS
+            )
+            return {"success": True, "url": url, "key": key}
+
+        except (BotoCoreError, ClientError) as e:
+            logger.error(f"S3 presign failed: {str(e)}")
+            return {"success": False, "error": str(e)}
+
+    def download(self, key: str, dest_path: str) -> Dict:
+        """Download an uploaded object to a local file for parsing"""
+        try:
+            self.client.download_file(self.bucket, key, dest_path)
+            return {"success": True, "file_path": dest_path}
+
+        except (BotoCoreError, ClientError) as e:
+            logger.error(f"S3 download failed: {str(e)}")
+            return {"success": False, "error": str(e)}
+
+    def s3_uri(self, key: str) -> str:
+        """Return the s3:// location stored on the report"""
+        return f"s3://{self.bucket}/{key}"
@@ -1,4 +1,6 @@
 import stripe
+from concurrent.futures import ThreadPoolExecutor
+from types import MappingProxyType
 from typing import Dict, Optional, List
 from config import settings
 import os
@@ -6,11 +8,30 @@ import logging
 
 logger = logging.getLogger(__name__)
 
+# Webhook event type -> StripeService handler method
+_WEBHOOK_HANDLERS = MappingProxyType({
+    "checkout.session.completed": "_handle_checkout_completed",
+    "invoice.paid": "_handle_invoice_paid",
+    "invoice.payment_failed": "_handle_payment_failed",
+    "customer.subscription.updated": "_handle_subscription_updated",
+    "customer.subscription.deleted": "_handle_subscription_deleted",
+    "payment_intent.succeeded": "_handle_payment_intent_succeeded",
+})
+
+# Stripe API calls: per-request timeout and retries on network errors
+# (retried POSTs carry an idempotency key, so they are safe to repeat)
+STRIPE_TIMEOUT_SECONDS = 30
+STRIPE_MAX_NETWORK_RETRIES = 2
+
 class StripeService:
     """Complete Stripe payment processing service"""
     
     def __init__(self):
         stripe.api_key = os.getenv("STRIPE_SECRET_KEY", "")
+        # Keep-alive sessions so API calls reuse connections instead of
+        # paying a TLS handshake each time
+        stripe.default_http_client = stripe.RequestsClient(timeout=STRIPE_TIMEOUT_SECONDS)
+        stripe.max_network_retries = STRIPE_MAX_NETWORK_RETRIES
         self.webhook_secret = os.getenv("STRIPE_WEBHOOK_SECRET", "")
         self.publishable_key = os.getenv("STRIPE_PUBLISHABLE_KEY", "")
     
@@ -60,7 +81,7 @@ class StripeService:
             return {"success": False, "error": str(e)}
     
     def create_price(self, product_id: str, amount: int, currency: str = "usd",
-                     interval: str = None) -> Dict:
+                     interval: str = None, lookup_key: str = None) -> Dict:
         """Create a Stripe price"""
         try:
             params = {
@@ -71,6 +92,8 @@ class StripeService:
             
             if interval:
                 params["recurring"] = {"interval": interval}
+            if lookup_key:
+                params["lookup_key"] = lookup_key
             
             price = stripe.Price.create(**params)
             return {"success": True, "price_id": price.id}
@@ -228,36 +251,48 @@ class StripeService:
     
     def handle_webhook(self, payload: bytes, signature: str) -> Dict:
         """Handle Stripe webhook events"""
+        verified = self.construct_event(payload, signature)
+        if not verified["success"]:
+            return verified
+        return self.handle_webhook_event(verified["event"])
+    
+    def construct_event(self, payload: bytes, signature: str) -> Dict:
+        """Verify a webhook signature and parse its event"""
+        # A header without a timestamp and v1 signature can never verify;
+        # turn it away before the SDK decodes the payload
+        if "t=" not in signature or "v1=" not in signature:
+            logger.error("Invalid webhook signature")
+            return {"success": False, "error": "Invalid signature"}
+        
         try:
             event = stripe.Webhook.construct_event(
                 payload, signature, self.webhook_secret
             )
+            return {"success": True, "event": event}
             
+        except stripe.error.SignatureVerificationError:
+            logger.error("Invalid webhook signature")
+            return {"success": False, "error": "Invalid signature"}
+        except Exception as e:
+            logger.error(f"Webhook verification error: {str(e)}")
+            return {"success": False, "error": str(e)}
+    
+    def handle_webhook_event(self, event) -> Dict:
+        """Dispatch a verified webhook event to its handler"""
+        try:
             event_type = event["type"]
             event_data = event["data"]["object"]
             
             logger.info(f"Processing webhook: {event_type}")
             
             # Handle different event types
-            handlers = {
-                "checkout.session.completed": self._handle_checkout_completed,
-                "invoice.paid": self._handle_invoice_paid,
-                "invoice.payment_failed": self._handle_payment_failed,
-                "customer.subscription.updated": self._handle_subscription_updated,
-                "customer.subscription.deleted": self._handle_subscription_deleted,
-                "payment_intent.succeeded": self._handle_payment_intent_succeeded
-            }
-            
-            handler = handlers.get(event_type)
-            if handler:
-                result = handler(event_data)
+            handler_name = _WEBHOOK_HANDLERS.get(event_type)
+            if handler_name:
+                result = getattr(self, handler_name)(event_data)
                 return {"success": True, "event_type": event_type, "result": result}
             
             return {"success": True, "event_type": event_type, "message": "No handler for this event"}
             
-        except stripe.error.SignatureVerificationError:
-            logger.error("Invalid webhook signature")
-            return {"success": False, "error": "Invalid signature"}
         except Exception as e:
             logger.error(f"Webhook handling error: {str(e)}")
             return {"success": False, "error": str(e)}
@@ -356,31 +391,70 @@ class StripeService:
         
         created_plans = []
         
-        for plan in plans:
-            try:
-                # Create product
-                product_result = self.create_product(plan["name"], plan["description"])
-                if not product_result["success"]:
-                    continue
-                
-                product_id = product_result["product_id"]
-                
-                # Create monthly price
-                monthly_result = self.create_price(
-                    product_id, 
-                    plan["price_monthly"], 
-                    interval="month"
-                )
-                
-                if monthly_result["success"]:
-                    created_plans.append({
-                        "name": plan["name"],
-                        "product_id": product_id,
-                        "monthly_price_id": monthly_result["price_id"],
-                        "features": plan["features"]
-                    })
-                    
-            except Exception as e:
-                logger.error(f"Failed to create plan {plan['name']}: {str(e)}")
+        # Monthly prices carry a lookup key, so plans created by an earlier
+        # run are found with one list call instead of being created again
+        lookup_keys = [f"{plan['slug']}_monthly" for plan in plans]
+        try:
+            existing_prices = {
+                price.lookup_key: price for price in stripe.Price.list(
+                    lookup_keys=lookup_keys, active=True, limit=len(lookup_keys)
+                ).data
+            }
+        except stripe.error.StripeError as e:
+            logger.error(f"Failed to look up existing plan prices: {str(e)}")
+            existing_prices = {}
+        
+        # Missing plans are created concurrently; each is a product then a price
+        missing = [(plan, lookup_key) for plan, lookup_key in zip(plans, lookup_keys)
+                   if lookup_key not in existing_prices]
+        created = {}
+        if missing:
+            with ThreadPoolExecutor(max_workers=len(missing)) as executor:
+                created = dict(zip(
+                    (lookup_key for _, lookup_key in missing),
+                    executor.map(lambda item: self._create_plan(*item), missing)
+                ))
+        
+        for plan, lookup_key in zip(plans, lookup_keys):
+            price = existing_prices.get(lookup_key)
+            if price:
+                created_plans.append({
+                    "name": plan["name"],
+                    "product_id": price.product,
+                    "monthly_price_id": price.id,
+                    "features": plan["features"]
+                })
+            elif created.get(lookup_key):
+                created_plans.append(created[lookup_key])
         
-        return created_plans
\ No newline at end of file
+        return created_plans
+    
+    def _create_plan(self, plan: Dict, lookup_key: str) -> Optional[Dict]:
+        """Create one plan's product and monthly price"""
+        try:
+            # Create product
+            product_result = self.create_product(plan["name"], plan["description"])
+            if not product_result["success"]:
+                return None
+            
+            product_id = product_result["product_id"]
+            
+            # Create monthly price
+            monthly_result = self.create_price(
+                product_id, 
+                plan["price_monthly"], 
+                interval="month",
+                lookup_key=lookup_key
+            )
+            
+            if monthly_result["success"]:
+                return {
+                    "name": plan["name"],
+                    "product_id": product_id,
+                    "monthly_price_id": monthly_result["price_id"],
+                    "features": plan["features"]
+                }
+                
+        except Exception as e:
+            logger.error(f"Failed to create plan {plan['name']}: {str(e)}")
+        return None
\ No newline at end of file
@@ -0,0 +1,75 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+import auth.auth_service as auth_module
+from auth.auth_service import AuthService, CurrentUser, USER_CACHE_TTL_SECONDS
+from database import Base
+from models import User
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        yield session
+
+
+@pytest.fixture(autouse=True)
+def empty_user_cache():
+    auth_module._user_cache.clear()
+    yield
+    auth_module._user_cache.clear()
+
+
+@pytest.fixture
+def user(db):
+    user = User(email="jane@example.com", password_hash="x", role="client", first_name="Jane", last_name="Doe")
+    db.add(user)
+    db.commit()
+    return user
+
+
+def test_access_token_resolves_to_current_user(db, user):
+    auth = AuthService()
+    token = auth.create_access_token({"user_id": user.id})
+    
+    current = auth.get_user_from_token(db, token)
+    
+    assert current == CurrentUser(user.id, "jane@example.com", "client", "Jane", "Doe", None)
+
+
+def test_refresh_token_is_not_a_credential(db, user):
+    auth = AuthService()
+    
+    assert auth.get_user_from_token(db, auth.create_refresh_token({"user_id": user.id})) is None
+
+
+def test_expired_access_token_is_rejected(db, user):
+    auth = AuthService()
+    token = auth.create_access_token(
+        {"user_id": user.id}, expires_delta=timedelta(minutes=15), now=datetime.utcnow() - timedelta(hours=1)
+    )
+    
+    assert auth.get_user_from_token(db, token) is None
+
+
+def test_current_user_is_cached_for_the_ttl(db, user, monkeypatch):
+    auth = AuthService()
+    token = auth.create_access_token({"user_id": user.id})
+    clock = [1000.0]
+    monkeypatch.setattr(auth_module.time, "monotonic", lambda: clock[0])
+    
+    assert auth.get_user_from_token(db, token).id == user.id
+    
+    # Deactivation is not seen until the cached entry expires
+    user.is_active = False
+    db.commit()
+    clock[0] += USER_CACHE_TTL_SECONDS - 1
+    assert auth.get_user_from_token(db, token).id == user.id
+    
+    clock[0] += 2
+    assert auth.get_user_from_token(db, token) is None
@@ -0,0 +1,43 @@
+from datetime import datetime
+
+from analyzers.error_detector import ErrorDetector
+
+NOW = datetime(2026, 10, 15, 12, 0)
+
+
+def _error_types(accounts=(), inquiries=()):
+    report = {"accounts": list(accounts), "parsed_data": {"inquiries": list(inquiries)}}
+    return [error["type"] for error in ErrorDetector().analyze_report(report, NOW)["errors"]]
+
+
+def _hard_inquiry(date):
+    return {"type": "hard", "creditor": "CHASE BANK", "inquiry_date": date}
+
+
+def _negative_account(date_opened):
+    return {"creditor": "CAPITAL ONE", "is_negative": True, "date_opened": date_opened}
+
+
+def test_inquiry_exactly_two_years_old_is_flagged():
+    assert "outdated_inquiry" in _error_types(inquiries=[_hard_inquiry("10/15/2024")])
+
+
+def test_inquiry_inside_two_years_is_not_flagged():
+    assert "outdated_inquiry" not in _error_types(inquiries=[_hard_inquiry("10/16/2024")])
+
+
+def test_negative_opened_exactly_seven_years_ago_is_flagged():
+    assert "outdated_negative" in _error_types(accounts=[_negative_account("10/2019")])
+
+
+def test_negative_opened_inside_seven_years_is_not_flagged():
+    assert "outdated_negative" not in _error_types(accounts=[_negative_account("11/2019")])
+
+
+def test_impossible_calendar_day_is_ignored():
+    assert "outdated_inquiry" not in _error_types(inquiries=[_hard_inquiry("02/30/2024")])
+
+
+def test_leap_day_only_valid_in_leap_years():
+    assert "outdated_inquiry" in _error_types(inquiries=[_hard_inquiry("02/29/2024")])
+    assert "outdated_inquiry" not in _error_types(inquiries=[_hard_inquiry("02/29/2023")])
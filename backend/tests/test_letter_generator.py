@@ -0,0 +1,82 @@
+import pytest
+
+from dispute_engine.letter_generator import LetterGenerator, generate_letter
+
+
+CLIENT = {
+    "full_name": "Jane Doe",
+    "address": "1 Main St",
+    "city": "Springfield",
+    "state": "IL",
+    "zip_code": "62701",
+    "ssn_last_four": "1234",
+    "date_of_birth": "1980-01-01"
+}
+
+DISPUTE = {
+    "bureau": "equifax",
+    "error_type": "outdated_negative",
+    "creditor_name": "Acme Bank",
+    "account_number": "XXXX5678",
+    "dispute_reason": "Account is older than seven years.",
+    "disputed_items": [
+        {"creditor_name": "Acme Bank", "account_number": "XXXX5678", "reason": "Obsolete"}
+    ]
+}
+
+LETTER_TYPES = [
+    "bureau_dispute",
+    "debt_validation",
+    "goodwill",
+    "direct_creditor",
+    "cfpb_warning",
+    "method_of_verification",
+    "cease_desist",
+    "section_605b"
+]
+
+
+@pytest.mark.parametrize("letter_type", LETTER_TYPES)
+def test_module_alias_matches_instance_method(letter_type):
+    assert generate_letter(letter_type, DISPUTE, CLIENT) == LetterGenerator().generate_letter(letter_type, DISPUTE, CLIENT)
+
+
+@pytest.mark.parametrize("letter_type", LETTER_TYPES)
+def test_letter_names_the_client(letter_type):
+    letter = generate_letter(letter_type, DISPUTE, CLIENT)
+    
+    assert "Jane Doe" in letter
+    assert "{{" not in letter
+
+
+def test_bureau_dispute_lists_items_and_citation():
+    letter = generate_letter("bureau_dispute", DISPUTE, CLIENT)
+    
+    assert "Equifax Information Services LLC" in letter
+    assert "P.O. Box 740256" in letter
+    assert "Item 1:\n- Creditor: Acme Bank\n- Account #: XXXX5678\n- Reason: Obsolete" in letter
+    assert "15 U.S.C. § 1681a(1)" in letter
+    assert "SSN: XXX-XX-1234" in letter
+
+
+def test_unknown_letter_type_falls_back_to_bureau_dispute():
+    assert generate_letter("no_such_letter", DISPUTE, CLIENT) == generate_letter("bureau_dispute", DISPUTE, CLIENT)
+
+
+def test_unknown_bureau_leaves_address_blank():
+    letter = generate_letter("bureau_dispute", dict(DISPUTE, bureau="acme"), CLIENT)
+    
+    assert "ACME" in letter
+    assert "[ITEM DETAILS TO BE INSERTED]" not in letter
+
+
+def test_missing_items_use_placeholder():
+    letter = generate_letter("bureau_dispute", dict(DISPUTE, disputed_items=[]), CLIENT)
+    
+    assert "[ITEM DETAILS TO BE INSERTED]" in letter
+
+
+def test_bulk_matches_single_letters():
+    jobs = [(letter_type, DISPUTE, CLIENT) for letter_type in LETTER_TYPES]
+    
+    assert LetterGenerator.generate_letters_bulk(jobs) == [generate_letter(*job) for job in jobs]
@@ -0,0 +1,179 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from database import Base
+from models import Client, Dispute, Notification, SchedulerRun, User
+from services.notification_scheduler import NotificationScheduler, SCHEDULER_RUN_STALE_AFTER
+
+NOW = datetime(2026, 10, 15, 6, 0)
+
+
+class FakeEmailService:
+    def __init__(self):
+        self.sent = []
+    
+    def submit(self, send, *args):
+        self.sent.append((send.__name__, args))
+    
+    def send_follow_up_reminder(self, *args):
+        pass
+    
+    def send_monthly_report(self, *args):
+        pass
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        yield session
+
+
+def _client(db, *emails):
+    client = Client(first_name="Jane", last_name="Doe", email=emails[0])
+    db.add(client)
+    db.flush()
+    db.add_all(User(email=email, password_hash="x", client_id=client.id) for email in emails)
+    return client
+
+
+def _sent_dispute(db, client, days_ago, now=NOW):
+    db.add(Dispute(
+        client_id=client.id,
+        bureau="equifax",
+        status="sent",
+        sent_date=now - timedelta(days=days_ago),
+        created_date=now - timedelta(days=days_ago)
+    ))
+
+
+def _due_for_every_check(db, client):
+    # run_daily_checks reads the real clock: one dispute overdue for a
+    # response, one opened this month for the monthly report
+    now = datetime.utcnow()
+    _sent_dispute(db, client, days_ago=40, now=now)
+    db.add(Dispute(client_id=client.id, bureau="experian", created_date=now - timedelta(days=1)))
+
+
+def _scheduler(db):
+    return NotificationScheduler(db, FakeEmailService())
+
+
+def test_notifications_are_bulk_inserted_with_column_defaults(db):
+    _client(db, "jane@example.com")
+    db.commit()
+    user_id = db.query(User.id).scalar()
+    
+    scheduler = _scheduler(db)
+    scheduler.insert_notifications([
+        {"user_id": user_id, "title": "A", "message": "first", "notification_type": "dispute_update"},
+        {"user_id": user_id, "title": "B", "message": "second", "notification_type": "dispute_update"}
+    ])
+    db.commit()
+    
+    notifications = db.query(Notification).order_by(Notification.id).all()
+    assert [n.title for n in notifications] == ["A", "B"]
+    assert all(n.is_read is False and n.created_at is not None for n in notifications)
+
+
+def test_follow_up_reminder_commits_with_its_notification(db):
+    client = _client(db, "jane@example.com")
+    _sent_dispute(db, client, days_ago=26)
+    _sent_dispute(db, client, days_ago=10)
+    db.commit()
+    
+    scheduler = _scheduler(db)
+    reminders = scheduler.check_follow_up_reminders(NOW)
+    db.rollback()
+    
+    assert [r["days_sent"] for r in reminders] == [26]
+    assert db.query(Dispute).filter(Dispute.follow_up_date == NOW).count() == 1
+    assert db.query(Notification).count() == 1
+    assert scheduler.email_service.sent == [
+        ("send_follow_up_reminder", ("jane@example.com", "Jane Doe", "equifax", 26))
+    ]
+    
+    # Already-reminded disputes are not reminded again
+    assert scheduler.check_follow_up_reminders(NOW) == []
+
+
+def test_deadline_violations_commit_their_notifications(db):
+    client = _client(db, "jane@example.com")
+    _sent_dispute(db, client, days_ago=35)
+    _sent_dispute(db, client, days_ago=20)
+    db.commit()
+    
+    violations = _scheduler(db).check_deadline_violations(NOW)
+    db.rollback()
+    
+    assert [v["days_overdue"] for v in violations] == [5]
+    assert db.query(Notification).count() == 1
+
+
+def test_client_with_several_logins_is_reminded_once(db):
+    client = _client(db, "jane@example.com", "jane.doe@example.com")
+    _due_for_every_check(db, client)
+    db.commit()
+    
+    results = _scheduler(db).run_daily_checks()
+    
+    assert len(results["follow_up_reminders"]) == 1
+    assert len(results["deadline_violations"]) == 1
+    assert len(results["monthly_reports"]) == 1
+
+
+def test_daily_checks_run_once_per_day(db):
+    client = _client(db, "jane@example.com")
+    _due_for_every_check(db, client)
+    db.commit()
+    
+    first = _scheduler(db).run_daily_checks()
+    second = _scheduler(db).run_daily_checks()
+    
+    assert all(first.values())
+    assert second == {"follow_up_reminders": [], "deadline_violations": [], "monthly_reports": []}
+    assert db.query(Notification).count() == 2
+    assert db.query(SchedulerRun).filter(SchedulerRun.finished_at.is_(None)).count() == 0
+
+
+def test_failed_check_leaves_its_claim_unfinished(db, monkeypatch):
+    client = _client(db, "jane@example.com")
+    _due_for_every_check(db, client)
+    db.commit()
+    
+    scheduler = _scheduler(db)
+    
+    def fail(now):
+        raise RuntimeError("SMTP down")
+    
+    monkeypatch.setattr(scheduler, "send_monthly_reports", fail)
+    with pytest.raises(RuntimeError):
+        scheduler.run_daily_checks()
+    
+    runs = {run.name.split(":")[1]: run.finished_at for run in db.query(SchedulerRun)}
+    assert runs["follow_up_reminders"] is not None
+    assert runs["deadline_violations"] is not None
+    assert runs["monthly_reports"] is None
+
+
+def test_only_a_stale_unfinished_claim_is_retaken(db):
+    scheduler = _scheduler(db)
+    now = datetime.utcnow()
+    db.add_all([
+        SchedulerRun(name="live", host="a", started_at=now),
+        SchedulerRun(name="stale", host="a", started_at=now - SCHEDULER_RUN_STALE_AFTER - timedelta(minutes=1)),
+        SchedulerRun(name="done", host="a", started_at=now - timedelta(days=1), finished_at=now - timedelta(days=1))
+    ])
+    db.commit()
+    
+    claims = {}
+    for name in ("live", "stale", "done"):
+        with scheduler._claim_run(name, now) as claimed:
+            claims[name] = claimed
+    
+    assert claims == {"live": False, "stale": True, "done": False}
+    assert db.get(SchedulerRun, "stale").finished_at is not None
@@ -0,0 +1,98 @@
+from parsers.ocr_integration import OCRIntegration
+
+DIGITAL_PAGE = "SmartCredit three-bureau report for John Smith, prepared for review"
+
+TABLE_ACCOUNT = {
+    "creditor_name": "CAPITAL ONE",
+    "account_number": "XXXX1234",
+    "account_type": "",
+    "current_balance": 1234.56,
+    "status": ""
+}
+
+SCANNED_PAGE_OCR = "\n--- Page 2 ---\nCHASE BANK 44001234 Revolving 2,500.00"
+
+
+def _direct_parse(page_texts):
+    return {
+        "format": "SmartCredit",
+        "bureau": "equifax",
+        "personal_info": {"name": "John Smith"},
+        "scores": {"equifax": 712, "experian": None, "transunion": None},
+        "accounts": [dict(TABLE_ACCOUNT)],
+        "inquiries": [],
+        "public_records": [],
+        "raw_text": "\n".join(page_texts),
+        "file_path": "report.pdf",
+        "page_texts": page_texts
+    }
+
+
+class FakeOCREngine:
+    def __init__(self, pages_text=SCANNED_PAGE_OCR):
+        self.pages_text = pages_text
+        self.page_calls = []
+        self.full_calls = 0
+    
+    def process_pdf_pages(self, pdf_path, pages, dpi=None):
+        self.page_calls.append(pages)
+        return self.pages_text
+    
+    def process_pdf(self, pdf_path, dpi=None):
+        self.full_calls += 1
+        return "\n--- Page 1 ---\nExperian credit score 688"
+
+
+def _process(page_texts, engine):
+    integration = OCRIntegration()
+    integration.ocr_engine = engine
+    integration.pdf_parser.parse_report = lambda file_path, bureau=None: _direct_parse(page_texts)
+    return integration.process_credit_report("report.pdf", "equifax")
+
+
+def test_fully_digital_report_skips_ocr():
+    engine = FakeOCREngine()
+    result = _process([DIGITAL_PAGE, DIGITAL_PAGE], engine)
+    
+    assert result["method_used"] == "pdf_parser"
+    assert result["data"]["accounts"] == [TABLE_ACCOUNT]
+    assert "page_texts" not in result["data"]
+    assert (engine.page_calls, engine.full_calls) == ([], 0)
+
+
+def test_only_pages_without_text_are_ocrd():
+    engine = FakeOCREngine()
+    result = _process([DIGITAL_PAGE, "", DIGITAL_PAGE], engine)
+    
+    assert (engine.page_calls, engine.full_calls) == ([[2]], 0)
+    assert result["method_used"] == "pdf_parser"
+
+
+def test_ocrd_pages_are_merged_into_the_direct_parse():
+    data = _process([DIGITAL_PAGE, " "], FakeOCREngine())["data"]
+    
+    # Table accounts, detected format and bureau survive the merge
+    assert data["format"] == "SmartCredit"
+    assert data["bureau"] == "equifax"
+    assert data["accounts"][0] == TABLE_ACCOUNT
+    assert [account["creditor_name"] for account in data["accounts"]] == ["CAPITAL ONE", "CHASE BANK"]
+    assert data["raw_text"].endswith(SCANNED_PAGE_OCR)
+    assert data["ocr_pages"] == [2]
+
+
+def test_failed_page_ocr_keeps_the_direct_parse():
+    result = _process([DIGITAL_PAGE, ""], FakeOCREngine("OCR Error: pdftoppm failed"))
+    
+    assert result["success"]
+    assert result["data"]["accounts"] == [TABLE_ACCOUNT]
+    assert "ocr_pages" not in result["data"]
+
+
+def test_report_without_text_layer_is_ocrd_whole():
+    engine = FakeOCREngine()
+    result = _process(["", ""], engine)
+    
+    assert (engine.page_calls, engine.full_calls) == ([], 1)
+    assert result["method_used"] == "ocr"
+    assert result["data"]["format"] == "OCR_Extracted"
+    assert result["data"]["scores"]["experian"] == 688
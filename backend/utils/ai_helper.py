@@ -1,21 +1,95 @@
+import asyncio
+import hashlib
 import openai
 import os
+import re
+import threading
+import tiktoken
+from collections import OrderedDict
+from functools import lru_cache
+
+# Analysis uses the small JSON-mode model; dispute prose stays on gpt-4
+DEFAULT_ANALYSIS_MODEL = "gpt-4o-mini"
+DEFAULT_DISPUTE_MODEL = "gpt-4"
+
+# Fixed schema so callers can json.loads the analysis without re-prompting
+ANALYSIS_SYSTEM_PROMPT = (
+    "You are a credit report analyzer. Extract key information and identify potential errors. "
+    "Respond with a single JSON object with exactly these keys: "
+    '"personal_info" (object with "name", "addresses", "ssn_last4", "date_of_birth"), '
+    '"accounts" (array of objects with "creditor", "account_number", "status", "balance"), '
+    '"negative_items" (array of objects with "creditor", "type", "date"), '
+    '"potential_errors" (array of objects with "item", "issue", "recommended_action"). '
+    "Use null for unknown values and empty arrays when nothing is found."
+)
+# JSON mode: the model is constrained to emit a parseable object
+ANALYSIS_RESPONSE_FORMAT = {"type": "json_object"}
+DISPUTE_SYSTEM_PROMPT = "You are a credit repair specialist. Write professional dispute reasons."
+
+# Prompt budget for report text, in model tokens
+ANALYSIS_TOKEN_BUDGET = 3000
+# Rough token size used when no tokenizer can be loaded
+CHARS_PER_TOKEN = 4
+# Longest run of lines scored as one section
+SECTION_MAX_LINES = 20
+
+_SECTION_BREAK = re.compile(r"\n\s*\n")
+# Terms marking the report sections the analysis depends on
+_SALIENT_TERMS = re.compile(
+    r"account|balance|late|collection|inquir|charge.?off|past due|bankrupt|judgment|lien",
+    re.IGNORECASE
+)
+# Recent analyses kept to skip repeat OpenAI calls for the same report
+ANALYSIS_CACHE_SIZE = 256
+
+@lru_cache(maxsize=None)
+def _encoding_for(model: str):
+    """tiktoken encoding for a model, or None if it cannot be loaded"""
+    try:
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            return tiktoken.get_encoding("o200k_base")
+    except Exception:
+        # Encodings are downloaded on first use; estimate from length offline
+        return None
+
+def _report_sections(report_text: str) -> list:
+    """Split report text into blank-line separated sections of bounded length"""
+    sections = []
+    for block in _SECTION_BREAK.split(report_text):
+        lines = block.strip().splitlines()
+        for start in range(0, len(lines), SECTION_MAX_LINES):
+            sections.append("\n".join(lines[start:start + SECTION_MAX_LINES]))
+    return [section for section in sections if section.strip()]
 
 class AIHelper:
-    def __init__(self):
-        openai.api_key = os.getenv("OPENAI_API_KEY", "")
+    def __init__(self, model: str = DEFAULT_ANALYSIS_MODEL, dispute_model: str = DEFAULT_DISPUTE_MODEL):
+        self.model = model
+        self.dispute_model = dispute_model
+        api_key = os.getenv("OPENAI_API_KEY", "")
+        self.client = openai.OpenAI(api_key=api_key)
+        # Async client so independent calls can overlap instead of queueing
+        self.async_client = openai.AsyncOpenAI(api_key=api_key)
+        self._analysis_cache = OrderedDict()
+        self._analysis_cache_lock = threading.Lock()
     
     def analyze_credit_report(self, report_text: str):
         """Use AI to analyze credit report text"""
+        key = self._analysis_key(report_text)
+        cached = self._cached_analysis(key)
+        if cached is not None:
+            return cached
         try:
-            response = openai.ChatCompletion.create(
-                model="gpt-4",
+            response = self.client.chat.completions.create(
+                model=self.model,
+                response_format=ANALYSIS_RESPONSE_FORMAT,
                 messages=[
-                    {"role": "system", "content": "You are a credit report analyzer. Extract key information and identify potential errors."},
-                    {"role": "user", "content": f"Analyze this credit report:\n\n{report_text[:4000]}"}
+                    {"role": "system", "content": ANALYSIS_SYSTEM_PROMPT},
+                    {"role": "user", "content": f"Analyze this credit report:\n\n{self._fit_report_text(report_text)}"}
                 ]
             )
-            return response.choices[0].message.content
+            return self._store_analysis(key, response.choices[0].message.content)
         except Exception as e:
             return f"AI analysis error: {str(e)}"
     
@@ -23,13 +97,113 @@ class AIHelper:
         """Generate AI-powered dispute reason"""
         try:
             prompt = f"Generate a professional dispute reason for: {error_type}\nAccount: {account_info}"
-            response = openai.ChatCompletion.create(
-                model="gpt-4",
+            response = self.client.chat.completions.create(
+                model=self.dispute_model,
                 messages=[
-                    {"role": "system", "content": "You are a credit repair specialist. Write professional dispute reasons."},
+                    {"role": "system", "content": DISPUTE_SYSTEM_PROMPT},
                     {"role": "user", "content": prompt}
                 ]
             )
             return response.choices[0].message.content
         except Exception as e:
-            return f"Dispute reason: {error_type} - Please investigate and correct this information."
\ No newline at end of file
+            return f"Dispute reason: {error_type} - Please investigate and correct this information."
+    
+    async def analyze_credit_report_async(self, report_text: str):
+        """Use AI to analyze credit report text without blocking the event loop"""
+        key = self._analysis_key(report_text)
+        cached = self._cached_analysis(key)
+        if cached is not None:
+            return cached
+        try:
+            response = await self.async_client.chat.completions.create(
+                model=self.model,
+                response_format=ANALYSIS_RESPONSE_FORMAT,
+                messages=[
+                    {"role": "system", "content": ANALYSIS_SYSTEM_PROMPT},
+                    {"role": "user", "content": f"Analyze this credit report:\n\n{self._fit_report_text(report_text)}"}
+                ]
+            )
+            return self._store_analysis(key, response.choices[0].message.content)
+        except Exception as e:
+            return f"AI analysis error: {str(e)}"
+    
+    async def generate_dispute_reason_async(self, error_type: str, account_info: dict):
+        """Generate AI-powered dispute reason without blocking the event loop"""
+        try:
+            prompt = f"Generate a professional dispute reason for: {error_type}\nAccount: {account_info}"
+            response = await self.async_client.chat.completions.create(
+                model=self.dispute_model,
+                messages=[
+                    {"role": "system", "content": DISPUTE_SYSTEM_PROMPT},
+                    {"role": "user", "content": prompt}
+                ]
+            )
+            return response.choices[0].message.content
+        except Exception:
+            return f"Dispute reason: {error_type} - Please investigate and correct this information."
+    
+    async def analyze_credit_reports(self, report_texts):
+        """Analyze several reports concurrently; results follow input order"""
+        return await asyncio.gather(
+            *(self.analyze_credit_report_async(text) for text in report_texts)
+        )
+    
+    def _fit_report_text(self, report_text: str) -> str:
+        """Trim report text to the token budget, keeping the most salient sections"""
+        encoding = _encoding_for(self.model)
+        
+        def count_tokens(text):
+            if encoding is None:
+                return len(text) // CHARS_PER_TOKEN + 1
+            return len(encoding.encode(text))
+        
+        if count_tokens(report_text) <= ANALYSIS_TOKEN_BUDGET:
+            return report_text
+        
+        sections = _report_sections(report_text)
+        sizes = [count_tokens(section) for section in sections]
+        # Densest sections first; sorted() is stable, so ties keep report order
+        ranked = sorted(
+            range(len(sections)),
+            key=lambda i: -len(_SALIENT_TERMS.findall(sections[i])) / sizes[i]
+        )
+        
+        chosen = []
+        used = 0
+        for i in ranked:
+            # +1 for the blank line rejoining the section
+            if used + sizes[i] + 1 <= ANALYSIS_TOKEN_BUDGET:
+                chosen.append(i)
+                used += sizes[i] + 1
+        
+        if not chosen:
+            # No section fits whole: fall back to the head of the report
+            if encoding is not None:
+                return encoding.decode(encoding.encode(report_text)[:ANALYSIS_TOKEN_BUDGET])
+            return report_text[:ANALYSIS_TOKEN_BUDGET * CHARS_PER_TOKEN]
+        
+        return "\n\n".join(sections[i] for i in sorted(chosen))
+    
+    @staticmethod
+    def _analysis_key(report_text: str) -> str:
+        """Cache key for a report (any part of it may reach the model)"""
+        return hashlib.sha256(report_text.encode("utf-8")).hexdigest()
+    
+    def _cached_analysis(self, key: str):
+        """Return a cached analysis, or None"""
+        with self._analysis_cache_lock:
+            content = self._analysis_cache.get(key)
+            if content is not None:
+                self._analysis_cache.move_to_end(key)
+            return content
+    
+    def _store_analysis(self, key: str, content: str) -> str:
+        """Remember a successful analysis, evicting the least recently used"""
+        if content is None:
+            return content
+        with self._analysis_cache_lock:
+            self._analysis_cache[key] = content
+            self._analysis_cache.move_to_end(key)
+            if len(self._analysis_cache) > ANALYSIS_CACHE_SIZE:
+                self._analysis_cache.popitem(last=False)
+        return content